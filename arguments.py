@@ -52,6 +52,8 @@ def get_general_args(args=None):
         help='log output to file rather than print by stdout')
     parser.add_argument('--n-process', type=int, default=cpu_count(),
         help='number of processes to be used for parallelization')
+    parser.add_argument('--eval-cache', type=str, default=None,
+        help='path of the on-disk cache of real problem evaluations, None means no caching')
 
     args, _ = parser.parse_known_args(args)
     return args
@@ -77,6 +79,14 @@ def get_surroagte_args(args=None):
         help='VaR parameter')
     parser.add_argument('--n-w', type=int, default=n_w,
         help='number of samples for mVaR calculation')
+    parser.add_argument('--eval-memory-budget', type=float, default=1024,
+        help='memory budget (MB) of surrogate evaluation, larger query batches are evaluated in chunks')
+    parser.add_argument('--warm-start', default=False, action='store_true',
+        help='initialize surrogate hyperparameter optimization from the previous iteration')
+    parser.add_argument('--refit-interval', type=int, default=1,
+        help='optimize surrogate hyperparameters every k iterations, otherwise only condition on new data')
+    parser.add_argument('--parallel-fit', default=False, action='store_true',
+        help='fit surrogate models of all objectives concurrently (processes for gp / ts, batched model for botorch)')
 
     args, _ = parser.parse_known_args(args)
     return args
@@ -121,6 +131,8 @@ def get_solver_args(args=None):
         help='number of samples for mVaR calculation')
     parser.add_argument('--batch-size', type=int, default=batch_size,
         help='size of the selected batch in one iteration')
+    parser.add_argument('--approx-front-interval', type=int, default=1,
+        help='recompute the NSGA-II approximate front of botorch solvers every k iterations (lazily, only when exported)')
 
     # ParetoDiscovery solver
     parser.add_argument('--n-cell', type=int, default=None,
@@ -141,6 +153,8 @@ def get_solver_args(args=None):
         help='scaling factor for choosing reference point in local optimization, see section 6.2.3')
     parser.add_argument('--n-grid-sample', type=int, default=100,
         help='number of samples on local manifold (grid), see section 6.3.1')
+    parser.add_argument('--batched-expansion', default=False, action='store_true',
+        help='run local optimization, compute exploration directions and grid samples of all samples at once in ParetoDiscovery')
 
     args, _ = parser.parse_known_args(args)
     return args
@@ -156,6 +170,8 @@ def get_selection_args(args=None):
         help='type of selection method for new batch')
     parser.add_argument('--batch-size', type=int, default=batch_size,
         help='size of the selected batch in one iteration')
+    parser.add_argument('--lazy-greedy', default=False, action='store_true',
+        help='use lazy greedy hypervolume improvement selection, which re-evaluates fewer candidates')
 
     args, _ = parser.parse_known_args(args)
     return args
@@ -47,14 +47,14 @@ def run_experiment(args, framework_args):
 
     # build problem, get initial samples
     problem, true_pfront, X_init, Y_init, rho_init = build_problem(
-        args.problem, args.n_var, args.n_obj, args.n_init_sample, args.n_process
+        args.problem, args.n_var, args.n_obj, args.n_init_sample, args.n_process, args.eval_cache
     )
     
     
     args.n_var, args.n_obj = problem.n_var, problem.n_obj
 
     ref_point_handler = RefPoint(
-        args.problem, args.n_var, args.n_obj, n_init_sample=args.n_init_sample
+        args.problem, args.n_var, args.n_obj, n_init_sample=args.n_init_sample, eval_cache=args.eval_cache
     )
 
     args.ref_point = ref_point_handler.get_ref_point(is_botorch=False)
@@ -111,6 +111,9 @@ def run_experiment(args, framework_args):
 
     run.finish()
 
+    # stop the evaluation process pool of expensive problems (see build_problem)
+    problem.close_process_pool()
+
 
 if __name__ == "__main__":
     from arguments import get_args
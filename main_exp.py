@@ -184,7 +184,9 @@ def run_experiment(args, framework_args):
 
         exporter.write_csvs()
         exporter.save_psmodel()
-    
+
+    # stop the evaluation process pool of expensive problems (see build_problem)
+    problem.close_process_pool()
     
 
 if __name__ == "__main__":
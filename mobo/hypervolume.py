@@ -0,0 +1,262 @@
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from heapq import heapify, heappush, heappop
+import numpy as np
+from pymoo.factory import get_performance_indicator
+
+'''
+Exact hypervolume computation (minimization) and vectorized hypervolume improvement of candidate points.
+For 2 and 3 objectives, the region dominated by a front (and bounded by the reference point) is decomposed
+into disjoint boxes by a dimension sweep, then hypervolume is the total volume of the boxes,
+and the improvement of any candidate is the volume of its own box minus its overlap with the dominated boxes.
+Higher dimensions fall back to pymoo.
+'''
+
+
+@lru_cache(maxsize=16)
+def _get_hv_indicator(ref_point):
+    return get_performance_indicator('hv', ref_point=np.array(ref_point))
+
+
+def _pymoo_hypervolume(Y, ref_point):
+    '''
+    Hypervolume by pymoo, indicator objects are cached by reference point
+    '''
+    if len(Y) == 0: return 0.0
+    return _get_hv_indicator(tuple(np.asarray(ref_point, dtype=float).tolist())).calc(Y)
+
+
+def _dominated_boxes_2d(Y, ref_point):
+    '''
+    Decompose the dominated region of 2D points into disjoint boxes by a sweep along the first objective
+    '''
+    Y = Y[np.lexsort(Y.T[::-1])]
+    x_bounds = np.append(Y[:, 0], ref_point[0])
+    y_min = np.minimum.accumulate(Y[:, 1])
+    lower = np.column_stack([x_bounds[:-1], y_min])
+    upper = np.column_stack([x_bounds[1:], np.full(len(Y), ref_point[1])])
+    valid = upper[:, 0] > lower[:, 0]
+    return lower[valid], upper[valid]
+
+
+def _dominated_boxes_3d(Y, ref_point):
+    '''
+    Decompose the dominated region of 3D points into disjoint boxes by a sweep along the third objective (HV3D+ style).
+    Points are inserted in ascending order of the third objective while maintaining the 2D staircase of inserted points,
+    the area newly covered by each point is split into boxes along the staircase and extruded up to the reference point,
+    since the covered area only grows during the sweep.
+    '''
+    Y = Y[np.argsort(Y[:, 2], kind='stable')]
+    r_x, r_y, r_z = ref_point.tolist()
+    stair_x, stair_y = [], [] # staircase sorted by x ascending, y descending
+    lower, upper = [], []
+    for x, y, z in Y.tolist():
+        idx = bisect_right(stair_x, x) - 1
+        if idx >= 0 and stair_y[idx] <= y: # covered by the staircase
+            continue
+        start = bisect_left(stair_x, x)
+        end = start
+        while end < len(stair_x) and stair_y[end] >= y:
+            end += 1
+        # boxes of newly covered area, split at the staircase points removed by the new point
+        x_bounds = [x] + stair_x[start:end] + [stair_x[end] if end < len(stair_x) else r_x]
+        y_tops = [stair_y[start - 1] if start > 0 else r_y] + stair_y[start:end]
+        for i, y_top in enumerate(y_tops):
+            if x_bounds[i + 1] > x_bounds[i] and y_top > y:
+                lower.append((x_bounds[i], y, z))
+                upper.append((x_bounds[i + 1], y_top, r_z))
+        stair_x[start:end] = [x]
+        stair_y[start:end] = [y]
+    return np.array(lower).reshape(-1, 3), np.array(upper).reshape(-1, 3)
+
+
+def dominated_boxes(Y, ref_point):
+    '''
+    Decompose the region dominated by Y and bounded by ref_point into disjoint boxes
+    Input:
+        Y: performance data, shape (n_sample, n_obj), n_obj should be 2 or 3
+        ref_point: reference point, shape (n_obj,)
+    Output:
+        lower, upper: lower and upper bounds of boxes, shape (n_box, n_obj)
+    '''
+    Y, ref_point = np.atleast_2d(np.asarray(Y, dtype=float)), np.asarray(ref_point, dtype=float)
+    n_obj = len(ref_point)
+    Y = Y[(Y < ref_point).all(axis=1)] if Y.size > 0 else np.zeros((0, n_obj))
+    if len(Y) == 0:
+        return np.zeros((0, n_obj)), np.zeros((0, n_obj))
+    if n_obj == 2:
+        return _dominated_boxes_2d(Y, ref_point)
+    elif n_obj == 3:
+        return _dominated_boxes_3d(Y, ref_point)
+    else:
+        raise NotImplementedError(f'box decomposition is not implemented for {n_obj} objectives')
+
+
+def hypervolume(Y, ref_point):
+    '''
+    Calculate hypervolume of Y based on ref_point
+    '''
+    Y, ref_point = np.asarray(Y, dtype=float), np.asarray(ref_point, dtype=float)
+    if len(ref_point) not in [2, 3]:
+        return _pymoo_hypervolume(np.atleast_2d(Y), ref_point)
+    lower, upper = dominated_boxes(Y, ref_point)
+    return np.prod(upper - lower, axis=1).sum()
+
+
+class HypervolumeImprovement:
+    '''
+    Hypervolume improvement of candidate points over a front, which supports scoring a batch of candidates
+    in one vectorized call and adding points to the front (e.g., after each greedy pick)
+    '''
+    def __init__(self, pfront, ref_point, max_block_elements=2 ** 22):
+        '''
+        Input:
+            pfront: current front, shape (n_sample, n_obj)
+            ref_point: reference point for hypervolume calculation
+            max_block_elements: maximum number of array elements of intermediate results when scoring candidates
+        '''
+        self.ref_point = np.asarray(ref_point, dtype=float)
+        self.n_obj = len(self.ref_point)
+        self.max_block_elements = max_block_elements
+        self.front = np.zeros((0, self.n_obj))
+        self._set_front(np.asarray(pfront, dtype=float).reshape(-1, self.n_obj))
+
+    def _set_front(self, front):
+        # only points strictly dominating the reference point matter
+        self.front = front[(front < self.ref_point).all(axis=1)]
+        if self.n_obj in [2, 3]:
+            self.lower, self.upper = dominated_boxes(self.front, self.ref_point)
+            self.hv = np.prod(self.upper - self.lower, axis=1).sum()
+        else:
+            self.hv = _pymoo_hypervolume(self.front, self.ref_point)
+
+    def update(self, y):
+        '''
+        Add new point(s) to the front
+        '''
+        self._set_front(np.vstack([self.front, np.atleast_2d(y)]))
+
+    def evaluate(self, Y):
+        '''
+        Calculate hypervolume improvement of each candidate point if it is added to the front individually
+        Input:
+            Y: candidate points, shape (n_candidate, n_obj)
+        Output:
+            hvi: hypervolume improvement, shape (n_candidate,)
+        '''
+        Y = np.atleast_2d(np.asarray(Y, dtype=float))
+        hvi = np.zeros(len(Y))
+        # candidates (weakly) dominated by the front or outside the reference point have exactly zero improvement
+        valid = (Y < self.ref_point).all(axis=1)
+        block_size = max(1, self.max_block_elements // (max(len(self.front), 1) * self.n_obj))
+        for start in range(0, len(Y), block_size):
+            Y_block = Y[start:start + block_size]
+            valid[start:start + block_size] &= ~(self.front[None] <= Y_block[:, None]).all(axis=2).any(axis=1)
+        if not valid.any():
+            return hvi
+
+        if self.n_obj not in [2, 3]:
+            for i in np.where(valid)[0]:
+                hvi[i] = _pymoo_hypervolume(np.vstack([self.front, Y[i]]), self.ref_point) - self.hv
+            return hvi
+
+        Y_valid = Y[valid]
+        volume = np.prod(self.ref_point - Y_valid, axis=1)
+        overlap = np.zeros(len(Y_valid))
+        block_size = max(1, self.max_block_elements // (max(len(self.lower), 1) * self.n_obj))
+        for start in range(0, len(Y_valid), block_size):
+            Y_block = Y_valid[start:start + block_size, None]
+            overlap[start:start + block_size] = np.prod(np.clip(self.upper - np.maximum(self.lower, Y_block), 0, None), axis=2).sum(axis=1)
+        hvi[valid] = volume - overlap
+        return hvi
+
+
+def lazy_greedy_selection(hvi, Y, batch_size, labels=None):
+    '''
+    Greedily select candidates maximizing hypervolume improvement, lazily.
+    Since hypervolume improvement can only shrink as the front grows, candidates are kept in a priority queue keyed by
+    their last known improvement (an upper bound) and only the top entry is re-evaluated, which selects the same batch as
+    re-scoring all candidates after each pick (ties broken by the lower index, random choice if nothing improves).
+    Input:
+        hvi: HypervolumeImprovement of the current front, updated in place with the selected candidates
+        Y: candidate points, shape (n_candidate, n_obj)
+        batch_size: number of candidates to select
+        labels: family labels of candidates, if provided, only one candidate per family is selected in each cycle
+            until all families are visited
+    Output:
+        indices: indices of selected candidates
+    '''
+    n_candidate = len(Y)
+    selected = np.zeros(n_candidate, dtype=bool)
+    visited = np.zeros(n_candidate, dtype=bool) # candidates of families visited in current cycle
+    evaluated_at = np.zeros(n_candidate, dtype=int) # number of picks when the bound is evaluated
+
+    heap = list(zip((-hvi.evaluate(Y)).tolist(), range(n_candidate)))
+    heapify(heap)
+    indices = []
+
+    for n_pick in range(batch_size):
+        if labels is not None and (visited | selected).all(): # all families were visited, start new cycle
+            visited[:] = False
+
+        # find the candidate with maximum improvement among unvisited ones
+        best_idx, skipped = -1, []
+        while len(heap) > 0:
+            neg_bound, idx = heappop(heap)
+            if selected[idx]:
+                continue
+            if visited[idx]:
+                skipped.append((neg_bound, idx))
+                continue
+            if evaluated_at[idx] == n_pick: # bound is up-to-date so no other candidate can be better
+                best_idx, best_hvi = idx, -neg_bound
+                skipped.append((neg_bound, idx))
+                break
+            evaluated_at[idx] = n_pick
+            heappush(heap, (-hvi.evaluate(Y[idx])[0], idx))
+        for item in skipped:
+            heappush(heap, item)
+
+        if best_idx == -1 or best_hvi <= 0.: # if all candidates have no hypervolume contribution, just randomly select one
+            best_idx = np.random.choice(np.where(~(selected | visited))[0])
+
+        selected[best_idx] = True
+        if labels is not None:
+            visited[labels == labels[best_idx]] = True
+        hvi.update(Y[best_idx])
+        indices.append(best_idx)
+
+    return indices
+
+
+if __name__ == '__main__':
+    # check against pymoo and benchmark (lazy) greedy selection of 1000 candidates, run by: python -m mobo.hypervolume
+    from time import time
+
+    np.random.seed(0)
+    for n_obj in [2, 3]:
+        ref_point = np.ones(n_obj) * 1.1
+        for _ in range(20):
+            Y = np.random.rand(np.random.randint(1, 50), n_obj)
+            assert np.isclose(hypervolume(Y, ref_point), _pymoo_hypervolume(Y, ref_point))
+            C = np.random.rand(20, n_obj)
+            hvi = HypervolumeImprovement(Y, ref_point).evaluate(C)
+            hvi_pymoo = [_pymoo_hypervolume(np.vstack([Y, c]), ref_point) - _pymoo_hypervolume(Y, ref_point) for c in C]
+            assert np.allclose(hvi, hvi_pymoo)
+
+        pfront = np.random.rand(50, n_obj)
+        candidates = np.random.rand(1000, n_obj)
+        batch_size = 10
+        t = time()
+        hvi = HypervolumeImprovement(pfront, ref_point)
+        indices = []
+        for _ in range(batch_size):
+            idx = np.argmax(hvi.evaluate(candidates))
+            hvi.update(candidates[idx])
+            indices.append(idx)
+        print(f'n_obj: {n_obj}, greedy selection of {batch_size} from {len(candidates)} candidates: {time() - t:.4f}s')
+
+        t = time()
+        indices_lazy = lazy_greedy_selection(HypervolumeImprovement(pfront, ref_point), candidates, batch_size)
+        print(f'n_obj: {n_obj}, lazy greedy selection of {batch_size} from {len(candidates)} candidates: {time() - t:.4f}s')
+        assert indices == indices_lazy
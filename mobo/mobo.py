@@ -2,7 +2,7 @@ import numpy as np
 from .surrogate_problem import SurrogateProblem
 from .utils import (
     Timer,
-    find_pareto_front,
+    ParetoArchive,
     calc_hypervolume,
     calculate_var
 )
@@ -59,6 +59,9 @@ class MOBO:
         # to keep track of data and pareto information (current status of algorithm)
 
         self.sample_num = 0
+        self.n_fit_sample = 0 # number of samples the surrogate model is fitted on
+        self.pareto_archive = ParetoArchive() # incrementally maintained pareto front of Y
+        self.mvar_pareto_archive = ParetoArchive() # incrementally maintained pareto front of MVaR
         self.status = {
             'pset': None,
             'pfront': None,
@@ -87,15 +90,17 @@ class MOBO:
             self.rho = np.vstack([self.rho, rho]) if rho is not None else None
         self.sample_num += len(X)
 
-        self.status['pfront'], pfront_idx = find_pareto_front(self.Y, return_index=True)
+        # only the new batch needs to be compared against the current front
+        self.status['pfront'], pfront_idx = self.pareto_archive.update(Y)
         self.status['pset'] = self.X[pfront_idx]
         self.status['hv'] = calc_hypervolume(self.status['pfront'], self.ref_point_handler.get_ref_point(is_botorch=False))
         
         #MVaR Calculation
         
-        #compute MVaR HV
-        mvar = calculate_var(self.Y, variance=self.rho, alpha=self.solver.alpha)
-        mvar_pfront, mvar_pidx = find_pareto_front(mvar, return_index=True)
+        #compute MVaR HV, MVaR of old samples does not change so only the new batch is added
+        mvar_next = calculate_var(Y, variance=rho, alpha=self.solver.alpha)
+        mvar = mvar_next if self.sample_num == len(X) else np.vstack([self.status['mvar'], mvar_next])
+        mvar_pfront, mvar_pidx = self.mvar_pareto_archive.update(mvar_next)
         mvar_pset = self.X[mvar_pidx]
         mvar_hv_value = calc_hypervolume(mvar_pfront, ref_point=self.ref_point_handler.get_ref_point(is_botorch=False))
     
@@ -115,8 +120,13 @@ class MOBO:
         X = self.transformation.do(self.X)
         Y, rho = self.Y, self.rho
 
-        # build surrogate models
-        self.surrogate_model.fit(X, Y, rho)
+        # build surrogate models, only condition on the new batch if hyperparameters are not optimized in this iteration
+        n_new = self.sample_num - self.n_fit_sample
+        if self.n_fit_sample > 0 and not self.surrogate_model.need_optimize():
+            self.surrogate_model.update(X[-n_new:], Y[-n_new:], rho[-n_new:] if rho is not None else None)
+        else:
+            self.surrogate_model.fit(X, Y, rho)
+        self.n_fit_sample = self.sample_num
         timer.log("Surrogate model fitted")
 
         # define acquisition functions
@@ -0,0 +1,158 @@
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+'''
+Fast non-dominated filtering (minimization), used by find_pareto_front.
+A point is dominated if another point is no worse in all objectives and strictly better in at least one,
+so duplicated points are not dominating each other and are all kept.
+'''
+
+
+def find_nondominated_indices(Y):
+    '''
+    Find indices of the undominated part of the input performance data
+    Input:
+        Y: performance data, shape (n_sample, n_obj)
+    Output:
+        indices: indices of undominated samples, sorted by the first objective
+    '''
+    Y = np.asarray(Y, dtype=float)
+    if len(Y) == 0:
+        return np.zeros(0, dtype=int)
+    n_obj = Y.shape[1]
+    if n_obj == 2:
+        return _nondominated_2d(Y)
+    elif n_obj == 3:
+        return _nondominated_3d(Y)
+    else:
+        return _nondominated_nd(Y)
+
+
+def _lexsort_rows(Y):
+    '''
+    Lexicographical order of rows of Y (first column as primary key), also returns the first row index of each group of identical rows
+    '''
+    order = np.lexsort(Y.T[::-1])
+    Y_sorted = Y[order]
+    new_group = np.ones(len(Y), dtype=bool)
+    new_group[1:] = (Y_sorted[1:] != Y_sorted[:-1]).any(axis=1)
+    group_start = np.maximum.accumulate(np.where(new_group, np.arange(len(Y)), 0))
+    return order, Y_sorted, new_group, group_start
+
+
+def _nondominated_2d(Y):
+    '''
+    O(N log N) sweep for 2 objectives: after lexicographical sorting, a point is dominated iff
+    the minimum second objective among all preceding (non-identical) points is no larger than its own
+    '''
+    order, Y_sorted, _, group_start = _lexsort_rows(Y)
+    prev_min = np.empty(len(Y))
+    prev_min[0] = np.inf
+    prev_min[1:] = np.minimum.accumulate(Y_sorted[:-1, 1])
+    dominated = prev_min[group_start] <= Y_sorted[:, 1]
+    return order[~dominated]
+
+
+def _nondominated_3d(Y):
+    '''
+    O(N log N) sweep for 3 objectives: points are processed in lexicographical order while maintaining
+    the 2D staircase (undominated projections on the last two objectives) of processed points
+    '''
+    order, Y_sorted, new_group, _ = _lexsort_rows(Y)
+    stair_y1, stair_y2 = [], [] # staircase sorted by y1 ascending, y2 descending
+    dominated = np.zeros(len(Y), dtype=bool)
+    for i, (y1, y2) in enumerate(Y_sorted[:, 1:].tolist()):
+        if not new_group[i]: # identical to the previous point
+            dominated[i] = dominated[i - 1]
+            continue
+        # the staircase point with the largest y1 <= current y1 has the smallest y2 among those
+        idx = bisect_right(stair_y1, y1) - 1
+        if idx >= 0 and stair_y2[idx] <= y2:
+            dominated[i] = True
+            continue
+        # insert into staircase and remove the staircase points it dominates
+        start = bisect_left(stair_y1, y1)
+        end = start
+        while end < len(stair_y1) and stair_y2[end] >= y2:
+            end += 1
+        stair_y1[start:end] = [y1]
+        stair_y2[start:end] = [y2]
+    return order[~dominated]
+
+
+def _nondominated_nd(Y, block_size=256, max_block_elements=2 ** 22):
+    '''
+    Blocked filter for any number of objectives: points are sorted by (sum of objectives, objectives),
+    so a point can only be dominated by points before it, then blocks are compared against the current front
+    '''
+    n_sample, n_obj = Y.shape
+    order = np.lexsort(np.vstack([Y.T[::-1], Y.sum(axis=1)]))
+    Y_sorted = Y[order]
+    front_idx = np.zeros(0, dtype=int)
+
+    for start in range(0, n_sample, block_size):
+        Y_block = Y_sorted[start:start + block_size]
+        dominated = _is_dominated_blocked(Y_block, Y_sorted[front_idx], max_block_elements)
+        dominated |= _is_dominated_blocked(Y_block, Y_block, max_block_elements)
+        front_idx = np.concatenate([front_idx, start + np.where(~dominated)[0]])
+
+    indices = order[front_idx]
+    return indices[np.lexsort(Y[indices].T[::-1])]
+
+
+def _is_dominated_blocked(Y, Y_ref, max_block_elements):
+    '''
+    Check whether each row of Y is dominated by any row of Y_ref, comparing Y_ref in chunks to bound memory
+    '''
+    dominated = np.zeros(len(Y), dtype=bool)
+    if len(Y) == 0 or len(Y_ref) == 0:
+        return dominated
+    chunk_size = max(1, max_block_elements // (len(Y) * Y.shape[1]))
+    for start in range(0, len(Y_ref), chunk_size):
+        Y_chunk = Y_ref[None, start:start + chunk_size]
+        dominated |= np.logical_and((Y_chunk <= Y[:, None]).all(axis=2), (Y_chunk < Y[:, None]).any(axis=2)).any(axis=1)
+    return dominated
+
+
+def _find_pareto_front_loop(Y):
+    '''
+    Original pairwise implementation, kept as reference for the benchmark
+    '''
+    pareto_indices = []
+    for idx in np.argsort(Y.T[0]):
+        if not (np.logical_and((Y <= Y[idx]).all(axis=1), (Y < Y[idx]).any(axis=1))).any():
+            pareto_indices.append(idx)
+    return np.array(pareto_indices, dtype=int)
+
+
+if __name__ == '__main__':
+    # benchmark against the original implementation, run by: python -m mobo.nondominated
+    from argparse import ArgumentParser
+    from time import time
+
+    parser = ArgumentParser()
+    parser.add_argument('--n-samples', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--n-objs', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('--max-loop-sample', type=int, default=100000, help='largest size to run the original implementation on')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    for n_obj in args.n_objs:
+        for n_sample in args.n_samples:
+            # points scattered around a front so that the front size grows with the sample size
+            Y = np.random.rand(n_sample, n_obj)
+            Y = Y / np.linalg.norm(Y, axis=1, keepdims=True) + 0.1 * np.random.rand(n_sample, n_obj)
+
+            t = time()
+            indices = find_nondominated_indices(Y)
+            t_fast = time() - t
+            msg = f'n_obj: {n_obj}, n_sample: {n_sample}, front size: {len(indices)}, fast: {t_fast:.4f}s'
+
+            if n_sample <= args.max_loop_sample:
+                t = time()
+                indices_loop = _find_pareto_front_loop(Y)
+                t_loop = time() - t
+                assert set(indices) == set(indices_loop)
+                msg += f', original: {t_loop:.4f}s, speedup: {t_loop / max(t_fast, 1e-9):.1f}x'
+            print(msg)
@@ -45,11 +45,15 @@ class Selection(ABC):
         '''
         pass
 
-from .utils import calc_hypervolume
+from .hypervolume import HypervolumeImprovement, lazy_greedy_selection
 class HVI(Selection):
     '''
     Hypervolume Improvement
     '''
+    def __init__(self, batch_size, ref_point=None, lazy_greedy=False, **kwargs):
+        super().__init__(batch_size, ref_point, **kwargs)
+        self.lazy_greedy = lazy_greedy
+
     def select(self, solution, surrogate_model, status, transformation):
 
         pred_pset = solution['x']
@@ -57,27 +61,25 @@ class HVI(Selection):
         pred_pfront = val['F']
         pred_pset, pred_pfront = transformation.undo(pred_pset, pred_pfront)
 
-        curr_pfront = status['pfront'].copy()
+        hvi = HypervolumeImprovement(status['pfront'], self.ref_point)
+        if self.lazy_greedy:
+            next_batch_indices = lazy_greedy_selection(hvi, pred_pfront, self.batch_size)
+            return pred_pset[next_batch_indices], None
+
         idx_choices = np.ma.array(np.arange(len(pred_pset)), mask=False) # mask array for index choices
         next_batch_indices = []
 
         # greedily select indices that maximize hypervolume contribution
         for _ in range(self.batch_size):
-            curr_hv = calc_hypervolume(curr_pfront, self.ref_point)
-            max_hv_contrib = 0.
-            max_hv_idx = -1
-            for idx in idx_choices.compressed():
-                # calculate hypervolume contribution
-                new_hv = calc_hypervolume(np.vstack([curr_pfront, pred_pfront[idx]]), self.ref_point)
-                hv_contrib = new_hv - curr_hv
-                if hv_contrib > max_hv_contrib:
-                    max_hv_contrib = hv_contrib
-                    max_hv_idx = idx
-            if max_hv_idx == -1: # if all candidates have no hypervolume contribution, just randomly select one
+            # calculate hypervolume contribution of all remaining candidates at once
+            hv_contrib = hvi.evaluate(pred_pfront[idx_choices.compressed()])
+            if hv_contrib.max() > 0.:
+                max_hv_idx = idx_choices.compressed()[np.argmax(hv_contrib)]
+            else: # if all candidates have no hypervolume contribution, just randomly select one
                 max_hv_idx = np.random.choice(idx_choices.compressed())
 
             idx_choices.mask[max_hv_idx] = True # mask as selected
-            curr_pfront = np.vstack([curr_pfront, pred_pfront[max_hv_idx]]) # add to current pareto front
+            hvi.update(pred_pfront[max_hv_idx]) # add to current pareto front
             next_batch_indices.append(max_hv_idx)
         next_batch_indices = np.array(next_batch_indices)
 
@@ -132,10 +134,14 @@ class DGEMOSelect(Selection):
     '''
     has_family = True
 
+    def __init__(self, batch_size, ref_point=None, lazy_greedy=False, **kwargs):
+        super().__init__(batch_size, ref_point, **kwargs)
+        self.lazy_greedy = lazy_greedy
+
     def select(self, solution, surrogate_model, status, transformation):
         algo = solution['algo']
 
-        X_next, _, family_lbls_next = algo.propose_next_batch(status['pfront'], self.ref_point, self.batch_size, transformation)
+        X_next, _, family_lbls_next = algo.propose_next_batch(status['pfront'], self.ref_point, self.batch_size, transformation, lazy_greedy=self.lazy_greedy)
         family_lbls, approx_pset, approx_pfront = algo.get_sparse_front(transformation)
 
         info = {
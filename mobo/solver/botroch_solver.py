@@ -1,5 +1,6 @@
 from . import NSGA2Solver, Solver
 from mobo.solver.mvar_edit import MVaR, get_MARS, get_nehvi_ref_point
+from mobo.solver.memory import BatchLimitEstimator, estimate_batch_memory, reset_peak_memory, get_peak_memory
 from pymoo.algorithms.nsga2 import NSGA2
 from abc import abstractmethod
 
@@ -8,6 +9,7 @@ import torch
 import botorch
 
 from botorch.optim.optimize import optimize_acqf
+from botorch.optim.initializers import gen_batch_initial_conditions
 from botorch.acquisition.multi_objective.monte_carlo import (
     qExpectedHypervolumeImprovement,
     qNoisyExpectedHypervolumeImprovement,
@@ -35,6 +37,8 @@ from botorch.models.deterministic import DeterministicModel
 from botorch.models.model import ModelList
 import os
 import gc
+import traceback
+from multiprocessing import Process, Queue
 
 tkwargs = {
     "dtype": torch.double,
@@ -48,10 +52,67 @@ RAW_SAMPLES = 512 if not SMOKE_TEST else 4
 MC_SAMPLES = 128 if not SMOKE_TEST else 16
 
 
+def _optimize_acqf_restarts(acq_func, bounds, q, batch_initial_conditions, options, seed, n_thread, idx, queue):
+    '''
+    Run part of the restarts (from their initial conditions) of a multi-start acquisition optimization in a separate process and send back the best candidate,
+    or whether the error is a RuntimeError (e.g. out of memory) and its traceback if the optimization fails
+    '''
+    torch.manual_seed(seed)
+    torch.set_num_threads(n_thread)
+    try:
+        X_cand, acq_value = optimize_acqf(
+            acq_function=acq_func,
+            bounds=bounds,
+            q=q,
+            num_restarts=len(batch_initial_conditions),
+            raw_samples=None,
+            options=options,
+            batch_initial_conditions=batch_initial_conditions,
+        )
+        queue.put([idx, X_cand.detach().cpu().numpy(), acq_value.detach().cpu().numpy(), None])
+    except Exception as e:
+        queue.put([idx, None, None, (isinstance(e, RuntimeError), traceback.format_exc())])
+
+
 class BoTorchSolver(NSGA2Solver):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.n_process = kwargs.get("n_process", 1) # number of processes to distribute restarts of acquisition optimization
+        self.batch_limit_estimator = BatchLimitEstimator() # persists across iterations to reuse learned limits
+        self.approx_front_interval = kwargs.get("approx_front_interval", 1) # recompute approximate front every k solves
+        self.n_solve = 0
+        self._pending_approx = None # (problem, X, Y, seed) of a scheduled approximate front not computed yet
+
+    @property
+    def solution(self):
+        '''
+        Approximate front of the surrogate problem by NSGA-II, only needed for export (e.g. DataExport)
+        NOTE: computed lazily on first access after being scheduled by solve, otherwise the last computed front is kept.
+        NSGA-II runs on its own random state seeded at scheduling, so the global random state does not depend on whether or when it is read.
+        '''
+        if self._pending_approx is not None:
+            problem, X, Y, seed = self._pending_approx
+            self._pending_approx = None
+            random_state = np.random.get_state()
+            np.random.seed(seed)
+            try:
+                self._solution = self.nsga2_solve(problem, X, Y)
+            finally:
+                np.random.set_state(random_state)
+        return self._solution
+
+    @property
+    def approx_front_due(self):
+        '''
+        Whether a new approximate front was scheduled by solve and not read yet, i.e. whether exporting it gives new data
+        '''
+        return self._pending_approx is not None
+
+    @solution.setter
+    def solution(self, solution):
+        self._pending_approx = None
+        self._solution = solution
 
     @abstractmethod
     def bo_solve(self, problem, X, Y, rho):
@@ -64,34 +125,67 @@ class BoTorchSolver(NSGA2Solver):
 
         standard_bounds = torch.zeros(2, problem.n_var, **tkwargs)
         standard_bounds[1] = 1
-        options = {"batch_limit": self.batch_size, "maxiter": 2000}
 
-        while options["batch_limit"] >= 1:
+        # predict memory of a single t-batch, pending points of sequential optimization are counted as baseline
+        device = tkwargs["device"]
+        X_baseline = getattr(acq_func, "X_baseline", None)
+        n_baseline = 0 if X_baseline is None else X_baseline.shape[-2]
+        n_model = acq_func.model.num_outputs
+        q = 1 if sequential else self.batch_size
+        batch_memory = estimate_batch_memory(
+            q, n_baseline + self.batch_size - q, self.n_w, MC_SAMPLES, n_model
+        )
+        key = (acq_func.__class__.__name__, q, self.n_w, MC_SAMPLES, n_model)
+
+        # NOTE: CUDA cannot be used in forked processes, so restarts are only distributed on CPU
+        parallel = self.n_process > 1 and device.type != "cuda"
+
+        batch_limit = self.batch_limit_estimator.get_batch_limit(key, batch_memory, NUM_RESTARTS, device)
+        init_batch_limit = self.batch_limit_estimator.get_batch_limit(key, batch_memory, RAW_SAMPLES, device)
+        if parallel:
+            # restarts are optimized in all processes at the same time, while raw samples are evaluated in this process only
+            batch_limit = max(batch_limit // min(self.n_process, NUM_RESTARTS), 1)
+
+        while True:
+            options = {"batch_limit": batch_limit, "init_batch_limit": init_batch_limit, "maxiter": 2000}
+            memory_before = reset_peak_memory(device)
             try:
-                torch.cuda.empty_cache()
-                X_cand, Y_cand_pred = optimize_acqf(
-                    acq_function=acq_func,
-                    bounds=standard_bounds,
-                    q=self.batch_size,
-                    num_restarts=NUM_RESTARTS,
-                    raw_samples=RAW_SAMPLES,  # used for intialization heuristic
-                    options=options,
-                    sequential=sequential,
-                )
-                torch.cuda.empty_cache()
-                gc.collect()
+                if parallel:
+                    X_cand, Y_cand_pred = self.optimize_acqf_parallel(
+                        acq_func, standard_bounds, options, sequential=sequential
+                    )
+                else:
+                    X_cand, Y_cand_pred = optimize_acqf(
+                        acq_function=acq_func,
+                        bounds=standard_bounds,
+                        q=self.batch_size,
+                        num_restarts=NUM_RESTARTS,
+                        raw_samples=RAW_SAMPLES,  # used for intialization heuristic
+                        options=options,
+                        sequential=sequential,
+                    )
                 break
             except RuntimeError as e:
-                if options["batch_limit"] > 1:
+                if batch_limit > 1 or init_batch_limit > 1:
                     print(
                         "Got a RuntimeError in `optimize_acqf`. "
                         "Trying with reduced `batch_limit`."
                     )
-                    options["batch_limit"] //= 2
+                    self.batch_limit_estimator.record_failure(key, batch_memory, max(batch_limit, init_batch_limit), device)
+                    batch_limit = max(batch_limit // 2, 1)
+                    init_batch_limit = max(init_batch_limit // 2, 1)
+                    # release memory of the failed attempt
+                    gc.collect()
+                    torch.cuda.empty_cache()
                     continue
                 else:
                     raise e
 
+        # peak memory is only measured in this process, i.e. not for restarts distributed over processes
+        if not parallel:
+            peak_memory = get_peak_memory(device, memory_before)
+            self.batch_limit_estimator.record_success(key, batch_memory, min(batch_limit, init_batch_limit), peak_memory)
+
         selection = {
             "x": np.array(X_cand.detach().cpu()),
             "y": np.array(Y_cand_pred.detach().cpu()),
@@ -99,12 +193,103 @@ class BoTorchSolver(NSGA2Solver):
 
         return selection
 
+    def optimize_acqf_parallel(self, acq_func, bounds, options, sequential=False):
+        '''
+        Multi-start acquisition optimization with restarts (and raw samples) distributed over processes.
+        In sequential mode, candidates are optimized one at a time and added to pending points of acq_func as optimize_acqf does.
+        Output:
+            X_cand: best candidates, shape (batch_size, n_var)
+            acq_value: acquisition value of the joint candidates, or of each candidate in sequential mode
+        '''
+        if not sequential:
+            return self._optimize_acqf_multistart(acq_func, bounds, self.batch_size, options)
+
+        base_X_pending = acq_func.X_pending
+        candidates, acq_values = [], []
+        for _ in range(self.batch_size):
+            X_cand, acq_value = self._optimize_acqf_multistart(acq_func, bounds, 1, options)
+            candidates.append(X_cand)
+            acq_values.append(acq_value)
+            X_selected = torch.cat(candidates, dim=-2)
+            acq_func.set_X_pending(
+                X_selected if base_X_pending is None else torch.cat([base_X_pending, X_selected], dim=-2)
+            )
+        acq_func.set_X_pending(base_X_pending)
+        return torch.cat(candidates, dim=-2), torch.stack(acq_values)
+
+    def _optimize_acqf_multistart(self, acq_func, bounds, q, options):
+        '''
+        Optimize q joint candidates with restarts split over processes, each process is seeded deterministically from the global seed
+        NOTE: initial conditions are chosen from all raw samples here as optimize_acqf does, only the restarts from them are distributed.
+        Processes are forked so that each gets its own copy of the acquisition function (and models).
+        '''
+        n_process = min(self.n_process, NUM_RESTARTS)
+        batch_initial_conditions = gen_batch_initial_conditions(
+            acq_function=acq_func, bounds=bounds, q=q, num_restarts=NUM_RESTARTS, raw_samples=RAW_SAMPLES, options=options
+        )
+        restarts = torch.tensor_split(batch_initial_conditions, n_process)
+        base_seed = int(torch.randint(2 ** 30, (1,)))
+        n_thread = max(1, torch.get_num_threads() // n_process)
+
+        queue = Queue()
+        processes = [
+            Process(
+                target=_optimize_acqf_restarts,
+                args=(acq_func, bounds, q, restarts[i], options, base_seed + i, n_thread, i, queue),
+            )
+            for i in range(n_process)
+        ]
+        for p in processes:
+            p.start()
+        results = [None] * n_process
+        for _ in range(n_process):
+            idx, X_cand, acq_value, error = queue.get()
+            results[idx] = (X_cand, acq_value, error)
+        for p in processes:
+            p.join()
+
+        # only RuntimeErrors are raised as such so that optimize_acqf_loop retries them with a smaller batch_limit
+        errors = [error for _, _, error in results if error is not None]
+        for is_runtime_error, error in errors:
+            if is_runtime_error:
+                raise RuntimeError(f'acquisition optimization failed in subprocess:\n{error}')
+        if len(errors) > 0:
+            raise ChildProcessError(f'acquisition optimization failed in subprocess:\n{errors[0][1]}')
+
+        # best candidates over all processes, ties broken by the process index
+        best_idx = int(np.argmax([float(acq_value) for _, acq_value, _ in results]))
+        X_cand, acq_value = results[best_idx][:2]
+        return torch.from_numpy(X_cand).to(**tkwargs), torch.from_numpy(np.asarray(acq_value)).to(**tkwargs)
+
     def solve(self, problem, X, Y, rho):
-        # get pareto_front with NSGA because botorch is slow for large batches
-        self.solution = self.nsga2_solve(problem, X, Y)
+        # schedule pareto_front approximation with NSGA because botorch is slow for large batches, it is only computed when read
+        if self.n_solve % max(self.approx_front_interval, 1) == 0:
+            self._pending_approx = (problem, X.copy(), Y.copy(), np.random.randint(np.iinfo(np.int32).max))
+        self.n_solve += 1
         return self.bo_solve(problem, X, Y, rho)
 
-class qNEHVI(qNoisyExpectedHypervolumeImprovement):
+class BaselineNoiseCacheMixin:
+    """
+    Cache the posterior mean of the external noise model on X_baseline, which does not depend on the candidates,
+    so that each forward call only evaluates the noise model on the candidates.
+    The cache is refreshed when X_baseline changes (e.g., pending points are added in sequential optimization).
+    NOTE: the baseline block of the joint covariance is already cached by botorch (cache_root).
+    """
+    def _get_noise_mean(self, X):
+        X_baseline = self.X_baseline
+        cache = getattr(self, "_baseline_noise_cache", None)
+        if cache is None or cache[0].shape != X_baseline.shape or not torch.equal(cache[0], X_baseline):
+            with torch.no_grad():
+                cache = (X_baseline.clone(), self.ext_noise_model.posterior(X_baseline).mean)
+            self._baseline_noise_cache = cache
+        noise_mean_baseline = cache[1]
+        noise_mean = self.ext_noise_model.posterior(X).mean
+        # the mean is pointwise, so it equals the noise mean on torch.cat([X_baseline, X])
+        noise_mean_baseline = noise_mean_baseline.expand(*noise_mean.shape[:-2], *noise_mean_baseline.shape[-2:])
+        return torch.cat([noise_mean_baseline, noise_mean], dim=-2)
+
+
+class qNEHVI(BaselineNoiseCacheMixin, qNoisyExpectedHypervolumeImprovement):
     def __init__(self, ext_noise_model, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.ext_noise_model = ext_noise_model
@@ -113,9 +298,8 @@ class qNEHVI(qNoisyExpectedHypervolumeImprovement):
     @t_batch_mode_transform()
     def forward(self, X):
         X_full = torch.cat([match_batch_shape(self.X_baseline, X), X], dim=-2)
-        noise_posterior = self.ext_noise_model.posterior(X_full)
         posterior = self.model.posterior(
-            X_full, observation_noise=noise_posterior.mean
+            X_full, observation_noise=self._get_noise_mean(X)
         )
         event_shape_lag = 1 if is_ensemble(self.model) else 2
         n_w = (
@@ -129,7 +313,7 @@ class qNEHVI(qNoisyExpectedHypervolumeImprovement):
         return self._compute_qehvi(samples=samples, X=X) + self._prev_nehvi
 
 
-class qLogNEHVI(qLogNoisyExpectedHypervolumeImprovement):
+class qLogNEHVI(BaselineNoiseCacheMixin, qLogNoisyExpectedHypervolumeImprovement):
     def __init__(self, ext_noise_model, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.ext_noise_model = ext_noise_model
@@ -138,9 +322,8 @@ class qLogNEHVI(qLogNoisyExpectedHypervolumeImprovement):
     @t_batch_mode_transform()
     def forward(self, X):
         X_full = torch.cat([match_batch_shape(self.X_baseline, X), X], dim=-2)
-        noise_posterior = self.ext_noise_model.posterior(X_full)
         posterior = self.model.posterior(
-            X_full, observation_noise=noise_posterior.mean
+            X_full, observation_noise=self._get_noise_mean(X)
         )
         # Account for possible one-to-many transform and the model batch dimensions in
         # ensemble models.
@@ -205,7 +388,7 @@ class RAqLogNEHVISolver(RAqNEHVISolver):
         self.hvi_class = qLogNEHVI
 
 
-class qNEI(qNoisyExpectedImprovement):
+class qNEI(BaselineNoiseCacheMixin, qNoisyExpectedImprovement):
     def __init__(self, ext_noise_model, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.ext_noise_model = ext_noise_model
@@ -223,9 +406,8 @@ class qNEI(qNoisyExpectedImprovement):
         """
         q = X.shape[-2]
         X_full = torch.cat([match_batch_shape(self.X_baseline, X), X], dim=-2)
-        noise_posterior = self.ext_noise_model.posterior(X_full)
         posterior = self.model.posterior(
-            X_full, posterior_transform=self.posterior_transform, observation_noise=noise_posterior.mean
+            X_full, posterior_transform=self.posterior_transform, observation_noise=self._get_noise_mean(X)
         )
         
         if not self._cache_root:
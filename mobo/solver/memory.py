@@ -0,0 +1,133 @@
+import os
+import torch
+
+'''
+Memory-aware choice of batch_limit for acquisition function optimization (optimize_acqf).
+The peak memory of evaluating one t-batch (one restart) is predicted from the problem configuration,
+then scaled by a calibration factor learned from observed peaks and failed attempts, per configuration.
+Peaks are measured by CUDA memory statistics on GPU and by the peak resident set size of the process on CPU (linux only).
+'''
+
+
+def get_available_memory(device):
+    '''
+    Available memory (bytes) on device, None if unknown
+    '''
+    if device.type == 'cuda':
+        free, _ = torch.cuda.mem_get_info(device)
+        return free
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _read_proc_status(field):
+    '''
+    Memory field (e.g. VmRSS, VmHWM) of /proc/self/status in bytes, None if unavailable
+    '''
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_memory(device):
+    '''
+    Reset the peak memory statistics of this process on device
+    Output:
+        memory (bytes) currently in use, None if peaks cannot be measured
+    '''
+    if device.type == 'cuda':
+        torch.cuda.reset_peak_memory_stats(device)
+        return torch.cuda.memory_allocated(device)
+    # NOTE: writing 5 to clear_refs resets the peak resident set size (VmHWM) to the current one
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return None
+    return _read_proc_status('VmRSS')
+
+
+def get_peak_memory(device, memory_before):
+    '''
+    Peak memory (bytes) used on device since reset_peak_memory returned memory_before, None if unknown
+    '''
+    if memory_before is None:
+        return None
+    peak = torch.cuda.max_memory_allocated(device) if device.type == 'cuda' else _read_proc_status('VmHWM')
+    if peak is None:
+        return None
+    return max(peak - memory_before, 0)
+
+
+def estimate_batch_memory(q, n_baseline, n_w, mc_samples, n_model, bytes_per_element=8):
+    '''
+    Rough peak memory (bytes) of the acquisition forward and backward pass for a single t-batch
+    Input:
+        q: number of candidates jointly optimized
+        n_baseline: number of baseline (and pending) points concatenated to candidates
+        n_w: number of input perturbations per point
+        mc_samples: number of MC samples
+        n_model: number of outputs of the model
+    '''
+    n_cand, n_full = q * n_w, (q + n_baseline) * n_w
+    # posterior covariance blocks of candidates (against all points) for each model output
+    n_element = n_model * n_cand * n_full
+    # MC samples and their risk measure / objective values of all points
+    n_element += 2 * mc_samples * n_full * n_model
+    # intermediate tensors kept by autograd for the backward pass
+    n_element *= 4
+    return n_element * bytes_per_element
+
+
+class BatchLimitEstimator:
+    '''
+    Choose the largest batch_limit of optimize_acqf that fits in memory and learn from observed peaks per configuration
+    '''
+    def __init__(self, memory_fraction=0.5):
+        '''
+        Input:
+            memory_fraction: fraction of available memory the optimization is allowed to use
+        '''
+        self.memory_fraction = memory_fraction
+        self.calibration = {} # ratio of observed to estimated memory by configuration, configurations ignore baseline size
+
+    def get_batch_limit(self, key, batch_memory, max_limit, device):
+        '''
+        Input:
+            key: configuration of the acquisition function
+            batch_memory: estimated memory (bytes) of a single t-batch
+            max_limit: largest batch_limit useful
+        Output:
+            batch_limit: largest batch_limit predicted to be safe, in [1, max_limit]
+        '''
+        available = get_available_memory(device)
+        if available is None:
+            return max_limit
+        batch_memory = batch_memory * self.calibration.get(key, 1.0)
+        return int(min(max(available * self.memory_fraction // max(batch_memory, 1), 1), max_limit))
+
+    def record_success(self, key, batch_memory, batch_limit, peak_memory):
+        '''
+        Calibrate by the observed peak memory (bytes) of a successful optimization, None if it could not be measured
+        NOTE: a zero peak (e.g. memory reused by the allocator without growing the process) carries no information
+        '''
+        if not peak_memory:
+            return
+        self.calibration[key] = peak_memory / (batch_limit * max(batch_memory, 1))
+
+    def record_failure(self, key, batch_memory, batch_limit, device):
+        '''
+        Calibrate after running out of memory with batch_limit, so that the next choice is at most half of it
+        '''
+        available = get_available_memory(device)
+        if available is None:
+            return
+        ratio = 2 * available * self.memory_fraction / (batch_limit * max(batch_memory, 1))
+        self.calibration[key] = max(self.calibration.get(key, 1.0), ratio)
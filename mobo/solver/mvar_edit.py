@@ -216,6 +216,123 @@ class MVaR(BoTorchMVaR):
             mvar = alpha_level_points
         return mvar
 
+    def get_mvar_set_batched(
+        self, Y: Tensor, pad_size: Optional[int] = None, max_grid_elements: int = 2**18
+    ):
+        r"""Find MVaR sets of all batch elements at once, returning the same sets in the same
+        order as `get_mvar_set_cpu` without any per-sample Python loop.
+
+        For each batch element, the grid is formed by the `k` smallest samples of each
+        output (sorted in descending order, duplicates are masked out), where `k` is
+        the number of samples not larger than the independent VaR. The number of samples
+        dominating each grid point is a histogram of the grid positions of the samples
+        accumulated by cumulative sums along each output dimension. Alpha level points
+        dominated by other alpha level points are found by a cumulative maximum over the
+        grid shifted by one along each dimension.
+
+        Args:
+            Y: A `batch x n_w x m`-dim tensor of outcomes.
+            pad_size: The number of MVaR values returned for each batch element, padded by
+                repeating the last MVaR value. Defaults to the size of the largest MVaR set.
+            max_grid_elements: The maximum number of grid elements processed at once,
+                larger batches are processed in chunks to bound the memory.
+
+        Returns:
+            A two-element tuple containing
+
+            - A `batch x pad_size x m`-dim tensor of padded MVaR values.
+            - A `batch`-dim tensor of the MVaR set sizes.
+        """
+        batch, n_w, m = Y.shape
+        k = n_w - (ceil(self.alpha * self.n_w) - 1)
+        chunk_size = max(1, max_grid_elements // (k + 1) ** m)
+        points, n_mvar = [], []
+        for start in range(0, batch, chunk_size):
+            points_, n_mvar_ = self._get_mvar_points(Y[start : start + chunk_size], k)
+            points.append(points_)
+            n_mvar.append(n_mvar_)
+        points, n_mvar = torch.cat(points, dim=0), torch.cat(n_mvar, dim=0)
+
+        # pad each set by repeating its last entry
+        pad_size = int(n_mvar.max()) if pad_size is None else pad_size
+        offsets = n_mvar.cumsum(dim=0) - n_mvar
+        ranks = torch.minimum(
+            torch.arange(pad_size, device=Y.device).unsqueeze(0), (n_mvar - 1).unsqueeze(-1)
+        )
+        return points[offsets.unsqueeze(-1) + ranks], n_mvar
+
+    def _get_mvar_points(self, Y: Tensor, k: int):
+        r"""Compute the MVaR sets of a chunk of batch elements on the grid of the `k` smallest
+        samples of each output, see `get_mvar_set_batched`.
+
+        Returns:
+            A two-element tuple containing
+
+            - A `n_total x m`-dim tensor of MVaR values of all batch elements, concatenated.
+            - A `batch`-dim tensor of the MVaR set sizes.
+        """
+        batch, n_w, m = Y.shape
+        alpha_count = ceil(self.alpha * self.n_w)
+        grid_shape = (batch,) + (k,) * m
+
+        # grid values in ascending order, shape: batch x m x k
+        Y_t = Y.transpose(-1, -2).contiguous()
+        grid_asc = Y_t.topk(k, dim=-1, largest=False).values
+        # grid index (in descending order) of the first grid value not larger than each sample,
+        # equal to k if the sample is smaller than all grid values
+        pos = k - torch.searchsorted(grid_asc, Y_t, right=True)
+        # duplicated grid values are only kept at their first occurrence in descending order
+        grid = grid_asc.flip(-1)
+        unique = torch.ones_like(grid, dtype=torch.bool)
+        unique[..., 1:] = grid[..., 1:] != grid[..., :-1]
+
+        # number of samples dominating each grid point (non-normalized CDF)
+        flat_pos = pos[:, 0]
+        for i in range(1, m):
+            flat_pos = flat_pos * (k + 1) + pos[:, i]
+        counter = torch.zeros(batch, (k + 1) ** m, dtype=torch.long, device=Y.device)
+        counter.scatter_add_(1, flat_pos, torch.ones_like(flat_pos))
+        counter = counter.view((batch,) + (k + 1,) * m)
+        for i in range(m):
+            counter = counter.cumsum(dim=i + 1)
+        counter = counter[(slice(None),) + (slice(0, k),) * m]
+
+        valid = torch.ones(grid_shape, dtype=torch.bool, device=Y.device)
+        for i in range(m):
+            shape = [batch] + [1] * m
+            shape[i + 1] = k
+            valid = valid & unique[:, i].view(shape)
+        counter = counter.masked_fill(~valid, -1)
+
+        # alpha level points, or the points of the smallest count above alpha if there are none
+        counter_flat = counter.view(batch, -1)
+        has_alpha = (counter_flat == alpha_count).any(dim=-1)
+        min_greater = counter_flat.masked_fill(counter_flat <= alpha_count, n_w + 1).min(dim=-1).values
+        target = torch.where(has_alpha, torch.full_like(min_greater, alpha_count), min_greater)
+        level = counter == target.view((batch,) + (1,) * m)
+
+        # MVaR is simply the non-dominated subset of alpha level points, a point is dominated
+        # if there is any other level point with no larger grid index in all dimensions
+        if self.filter_dominated:
+            reach = level.to(torch.uint8)
+            for i in range(m):
+                reach = reach.cummax(dim=i + 1).values
+            dominated = torch.zeros_like(level)
+            for i in range(m):
+                head = [slice(None)] * (m + 1)
+                tail = [slice(None)] * (m + 1)
+                head[i + 1], tail[i + 1] = slice(1, None), slice(None, -1)
+                dominated[tuple(head)] |= reach[tuple(tail)].bool()
+            level = level & ~dominated
+
+        level_flat = level.view(batch, -1)
+        batch_idx, flat_idx = level_flat.nonzero(as_tuple=True)
+        points = []
+        for i in range(m):
+            grid_idx = flat_idx // k ** (m - 1 - i) % k
+            points.append(grid[batch_idx, i, grid_idx])
+        return torch.stack(points, dim=-1), level_flat.sum(dim=-1)
+
     def make_diffable(self, prepared_samples: Tensor, mvars: Tensor) -> List[Tensor]:
         r"""An experimental approach for obtaining the gradient of the MVaR via
         component-wise mapping to original samples.
@@ -229,11 +346,28 @@ class MVaR(BoTorchMVaR):
 
         Returns:
             The same `mvars` with entries mapped to inputs to produce gradients.
+
+        NOTE: each MVaR component is a sample value of the same output, so instead of comparing
+        every component with every sample, the samples of each output are sorted once and the
+        range of samples equal to each component is located by binary search. The component is
+        then gathered from (or averaged over) that range, which gives the same gradients as
+        averaging over all matching samples without the `k x n_w` repeat and mask.
         """
-        samples = prepared_samples.unsqueeze(-2).repeat(1, 1, mvars.shape[-2], 1)
-        mask = samples == mvars.unsqueeze(-3)
-        samples[~mask] = 0
-        return samples.sum(dim=-3) / mask.sum(dim=-3)
+        # batch x m x n_w
+        sorted_samples = prepared_samples.transpose(-1, -2).sort(dim=-1).values
+        mvars_t = mvars.transpose(-1, -2).contiguous()
+        with torch.no_grad():
+            sorted_detached = sorted_samples.detach().contiguous()
+            lo = torch.searchsorted(sorted_detached, mvars_t, right=False)
+            hi = torch.searchsorted(sorted_detached, mvars_t, right=True)
+        if (hi - lo == 1).all():
+            # each component comes from exactly one sample
+            return sorted_samples.gather(-1, lo).transpose(-1, -2).contiguous()
+        # average over tied samples by cumulative sums, the values are kept exact by a straight-through estimator
+        cumsum = torch.nn.functional.pad(sorted_samples.cumsum(dim=-1), (1, 0))
+        avg = (cumsum.gather(-1, hi) - cumsum.gather(-1, lo)) / (hi - lo)
+        avg = avg.transpose(-1, -2)
+        return mvars + avg - avg.detach()
 
     def forward(
         self,
@@ -265,24 +399,66 @@ class MVaR(BoTorchMVaR):
         prepared_samples = self._prepare_samples(samples)
         # This is -1 x n_w x m.
         prepared_samples = prepared_samples.reshape(-1, *prepared_samples.shape[-2:])
-        with torch.no_grad():
-            if use_cpu:
-                mvar_set = self.get_mvar_set_cpu(prepared_samples)
-            else:
+        if use_cpu:
+            # batched computation of all MVaR sets, already padded by repeating the last entry
+            with torch.no_grad():
+                mvars, n_mvar = self.get_mvar_set_batched(
+                    prepared_samples, pad_size=self.n_w if self.pad_to_n_w else None
+                )
+        else:
+            with torch.no_grad():
                 mvar_set = self.get_mvar_set_gpu(prepared_samples)
-        # Set the `pad_size` to either `self.n_w` or the size of the largest MVaR set.
-        pad_size = self.n_w if self.pad_to_n_w else max([_.shape[0] for _ in mvar_set])
-        padded_mvar_list = []
-        for mvar_ in mvar_set:
-            if self.expectation:
-                padded_mvar_list.append(mvar_.mean(dim=0))
-            else:
+            # Set the `pad_size` to either `self.n_w` or the size of the largest MVaR set.
+            pad_size = self.n_w if self.pad_to_n_w else max([_.shape[0] for _ in mvar_set])
+            padded_mvar_list = []
+            for mvar_ in mvar_set:
                 # Repeat the last entry to make `mvar_set` `pad_size x m`.
                 repeats_needed = pad_size - mvar_.shape[0]
                 padded_mvar_list.append(
                     torch.cat([mvar_, mvar_[-1].expand(repeats_needed, m)], dim=0)
                 )
-        mvars = torch.stack(padded_mvar_list, dim=0)
+            mvars = torch.stack(padded_mvar_list, dim=0)
+            n_mvar = torch.tensor([_.shape[0] for _ in mvar_set], device=mvars.device)
+        # NOTE: MVaR values are mapped to samples before taking the expectation, the mean of an MVaR set is not a sample value
         if samples.requires_grad:
             mvars = self.make_diffable(prepared_samples, mvars)
-        return mvars.view(*batch_shape, -1, m)
+        if self.expectation:
+            mask = torch.arange(mvars.shape[-2], device=mvars.device) < n_mvar.unsqueeze(-1)
+            mvars = (mvars * mask.unsqueeze(-1)).sum(dim=-2) / n_mvar.unsqueeze(-1)
+        return mvars.reshape(*batch_shape, -1, m)
+
+
+if __name__ == "__main__":
+    # benchmark against the per-sample implementation, run by: python -m mobo.solver.mvar_edit
+    from argparse import ArgumentParser
+    from time import time
+
+    parser = ArgumentParser()
+    parser.add_argument("--n-ws", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[32, 256, 1024])
+    parser.add_argument("--n-objs", type=int, nargs="+", default=[2, 3])
+    parser.add_argument("--alpha", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    for m in args.n_objs:
+        for n_w in args.n_ws:
+            for batch in args.batch_sizes:
+                mvar = MVaR(n_w=n_w, alpha=args.alpha)
+                Y = torch.randn(batch, n_w, m, dtype=torch.double)
+
+                t = time()
+                mvar_set = mvar.get_mvar_set_cpu(Y)
+                t_loop = time() - t
+
+                t = time()
+                mvars, n_mvar = mvar.get_mvar_set_batched(Y)
+                t_batched = time() - t
+
+                for mvar_, mvars_, n_ in zip(mvar_set, mvars, n_mvar.tolist()):
+                    assert torch.equal(mvar_, mvars_[:n_])
+                print(
+                    f"m: {m}, n_w: {n_w}, batch: {batch}, original: {t_loop:.4f}s, "
+                    f"batched: {t_batched:.4f}s, speedup: {t_loop / max(t_batched, 1e-9):.1f}x"
+                )
@@ -1,19 +1,19 @@
 import numpy as np
 from ..solver import Solver
+from ..worker_pool import WorkerPool
 from pymoo.optimize import minimize
 from pymoo.algorithms.so_cmaes import CMAES
 from pymoo.decomposition.tchebicheff import Tchebicheff
 from .utils import ScalarizedEvaluator
-from multiprocessing import Process, Queue
 
 
-def optimization(problem, x, weights, queue):
+def optimization(problem, x, weights):
     '''
-    Parallel worker for single-objective CMA-ES optimization
+    Task of the persistent worker pool for single-objective CMA-ES optimization
     '''
     evaluator = ScalarizedEvaluator(decomposition=Tchebicheff(), weights=weights)
     res = minimize(problem, CMAES(x), evaluator=evaluator)
-    queue.put([res.X[0], res.F[0]])
+    return [res.X[0], res.F[0]]
 
 
 class ParEGOSolver(Solver):
@@ -24,8 +24,10 @@ class ParEGOSolver(Solver):
         self.pop_size = kwargs['pop_size']
         self.n_process = kwargs.pop('n_process')
         super().__init__(*args, algo=CMAES, **kwargs)
+        # persistent workers reused by all solves, the surrogate problem is sent once per solve and then only weights are shipped
+        self.worker_pool = WorkerPool(self.n_process)
 
-    def solve(self, problem, X, Y):
+    def solve(self, problem, X, Y, *args, **kwargs):
         '''
         Solve the multi-objective problem by multiple scalarized single-objective solvers
         '''
@@ -39,24 +41,10 @@ class ParEGOSolver(Solver):
         weights /= np.expand_dims(np.sum(weights, axis=1), 1)
 
         # optimization
-        xs, ys = [], []
-        queue = Queue()
-        n_active_process = 0
-        for i, x0 in enumerate(sampling):
-            Process(target=optimization, args=(problem, x0, weights[i], queue)).start()
-            n_active_process += 1
-            if n_active_process >= self.n_process:
-                x, y = queue.get()
-                xs.append(x)
-                ys.append(y)
-                n_active_process -= 1
-
-        # gather result
-        for _ in range(n_active_process):
-            x, y = queue.get()
-            xs.append(x)
-            ys.append(y)
-        
+        self.worker_pool.set_problem(problem)
+        results = self.worker_pool.map(optimization, [(x0, weights[i]) for i, x0 in enumerate(sampling)])
+        xs, ys = [x for x, _ in results], [y for _, y in results]
+
         # construct solution
         self.solution = {'x': np.array(xs), 'y': np.array(ys)}
         return self.solution
\ No newline at end of file
@@ -1,7 +1,6 @@
 from abc import ABC, abstractmethod
 import numpy as np
 from scipy.spatial import Delaunay
-from copy import deepcopy
 from pygco import cut_from_graph
 
 from .utils import generate_weights_batch
@@ -31,12 +30,13 @@ class BufferBase(ABC):
         self.delta_b = delta_b
         self.label_cost = label_cost
         
-        # buffer element arrays
-        # NOTE: below initializations without prior size could be inefficient in memory access
-        self.buffer_x = [[] for _ in range(self.cell_num)]
-        self.buffer_y = [[] for _ in range(self.cell_num)]
-        self.buffer_dist = [[] for _ in range(self.cell_num)] # stores distance to origin for each sample, exactly the same size as self.buffer
-        self.buffer_patch_id = [[] for _ in range(self.cell_num)] # stores the index of manifold (patch) that each sample belongs to
+        # buffer element arrays, flattened over cells and sorted by (cell index, distance to origin)
+        self.buffer_x = None # shape = (sample_count, n_var), allocated at the first insertion
+        self.buffer_y = None # shape = (sample_count, n_obj)
+        self.buffer_dist = np.zeros(0) # stores distance to origin for each sample
+        self.buffer_patch_id = np.zeros(0, dtype=int) # stores the index of manifold (patch) that each sample belongs to
+        self.buffer_cell_id = np.zeros(0, dtype=int) # stores the cell index of each sample
+        self.cell_start = np.zeros(self.cell_num + 1, dtype=int) # samples of cell i are stored in [cell_start[i], cell_start[i + 1])
         
         self.sample_count = 0
         
@@ -51,6 +51,9 @@ class BufferBase(ABC):
         '''
         pass
 
+    def _cell_sizes(self):
+        return np.diff(self.cell_start)
+
     def insert(self, X, Y, patch_ids):
         '''
         Insert samples (X, Y) into buffer, which come from manifolds (patches) indexed by 'patch_ids'
@@ -64,17 +67,34 @@ class BufferBase(ABC):
         dists = np.linalg.norm(F, axis=1)
         cell_ids = self._find_cell_id(F)
 
-        # insert into buffer
-        for x, y, cell_id, dist, patch_id in zip(X, Y, cell_ids, dists, patch_ids):
-            self.buffer_x[cell_id].append(x)
-            self.buffer_y[cell_id].append(y)
-            self.buffer_dist[cell_id].append(dist)
-            self.buffer_patch_id[cell_id].append(patch_id)
-        self.sample_count += len(X)
+        if self.buffer_x is None:
+            self.buffer_x, self.buffer_y = np.zeros((0, X.shape[1])), np.zeros((0, Y.shape[1]))
 
-        # update cells
-        for cell_id in np.unique(cell_ids):
-            self._update_cell(cell_id)
+        # insert into buffer, new samples after existing ones so that ties in distance keep insertion order
+        self._rebuild(
+            np.vstack([self.buffer_x, X]),
+            np.vstack([self.buffer_y, Y]),
+            np.concatenate([self.buffer_dist, dists]),
+            np.concatenate([self.buffer_patch_id, np.asarray(patch_ids, dtype=int)]),
+            np.concatenate([self.buffer_cell_id, cell_ids]),
+        )
+
+    def _rebuild(self, x, y, dist, patch_id, cell_id):
+        '''
+        Sort samples by cell and distance to origin, and only keep self.cell_size samples in each cell
+        '''
+        idx = np.lexsort((dist, cell_id))
+        cell_id = cell_id[idx]
+        cell_start = np.concatenate([[0], np.cumsum(np.bincount(cell_id, minlength=self.cell_num))])
+        if self.cell_size is not None:
+            rank = np.arange(len(idx)) - cell_start[cell_id]
+            keep = rank < self.cell_size
+            idx, cell_id = idx[keep], cell_id[keep]
+            cell_start = np.concatenate([[0], np.cumsum(np.bincount(cell_id, minlength=self.cell_num))])
+
+        self.buffer_x, self.buffer_y, self.buffer_dist, self.buffer_patch_id = x[idx], y[idx], dist[idx], patch_id[idx]
+        self.buffer_cell_id, self.cell_start = cell_id, cell_start
+        self.sample_count = len(idx)
 
     def sample_old(self, n):
         '''
@@ -82,7 +102,7 @@ class BufferBase(ABC):
         '''
         # TODO: check if it's proper to repeatedly sample the best one without considering others
         selected_cell_ids = []
-        nonempty_cell_ids = [i for i in range(self.cell_num) if len(self.buffer_dist[i]) > 0]
+        nonempty_cell_ids = list(np.nonzero(self._cell_sizes() > 0)[0])
         n_nonempty_cells = len(nonempty_cell_ids) # number of non-empty cells
 
         # while n >= n_nonempty_cells, we select all non-empty cells
@@ -91,8 +111,7 @@ class BufferBase(ABC):
         selected_cell_ids.extend(list(np.random.choice(nonempty_cell_ids, size=n % n_nonempty_cells, replace=False)))
 
         # get the best solution in each cell
-        selected_cells = np.array(self.buffer_x)[np.array(selected_cell_ids)]
-        selected_samples = [cell[0] for cell in selected_cells]
+        selected_samples = self.buffer_x[self.cell_start[np.array(selected_cell_ids, dtype=int)]]
 
         return np.array(selected_samples)
 
@@ -100,12 +119,13 @@ class BufferBase(ABC):
         '''
         Sample n samples in current buffer with best performance. (Active)
         '''
-        nonempty_cell_ids = [i for i in range(self.cell_num) if len(self.buffer_dist[i]) > 0]
+        cell_sizes = self._cell_sizes()
+        nonempty_cell_ids = np.nonzero(cell_sizes > 0)[0]
 
         # when n is less than number of non-empty cells, randomly pick the 1st samples in cells
         if n <= len(nonempty_cell_ids):
             selected_cell_ids = np.random.choice(nonempty_cell_ids, size=n, replace=False)
-            selected_samples = [cell[0] for cell in np.array(self.buffer_x)[selected_cell_ids]]
+            selected_samples = list(self.buffer_x[self.cell_start[selected_cell_ids]])
         
         # when n is greater, pick samples in cells round by round (1st, 2nd, ...)
         else:
@@ -113,17 +133,16 @@ class BufferBase(ABC):
             selected_samples = []
             while len(selected_samples) < n:
                 # find cells need to be sampled in current round
-                nonempty_cell_ids = [i for i in range(self.cell_num) if len(self.buffer_dist[i]) > k]
+                nonempty_cell_ids = np.nonzero(cell_sizes > k)[0]
 
                 if len(nonempty_cell_ids) == 0: # when total number of samples in buffer is less than sample number
                     random_indices = np.random.choice(np.arange(len(selected_samples)), size=(n - len(selected_samples)))
                     selected_samples = np.vstack([selected_samples, np.array(selected_samples)[random_indices]])
                     break
                 
-                curr_selected_samples = [cell[k] for cell in np.array(self.buffer_x)[nonempty_cell_ids]]
+                curr_selected_samples = self.buffer_x[self.cell_start[nonempty_cell_ids] + k]
                 selected_samples.extend(np.random.permutation(curr_selected_samples))
-            selected_samples = np.array(selected_samples[:n])
-        return selected_samples
+        return np.array(selected_samples[:n])
 
     def move_origin(self, y_min):
         '''
@@ -133,30 +152,11 @@ class BufferBase(ABC):
 
         self.origin = np.minimum(self.origin, y_min) - self.origin_constant
 
-        old_buffer_x, old_buffer_y = deepcopy(self.buffer_x), deepcopy(self.buffer_y)
-        old_buffer_patch_id = deepcopy(self.buffer_patch_id)
-        self.buffer_x, self.buffer_y, self.buffer_dist, self.buffer_patch_id = [[[] for _ in range(self.cell_num)] for _ in range(4)]
-        self.sample_count = 0
-
-        for cell_x, cell_y, cell_patch_id in zip(old_buffer_x, old_buffer_y, old_buffer_patch_id):
-            if len(cell_x) > 0:
-                self.insert(cell_x, cell_y, cell_patch_id)
+        if self.sample_count == 0: return
 
-    def _update_cell(self, cell_id):
-        '''
-        Sort particular cell according to distance to origin, and only keep self.cell_size samples in the cell
-        '''
-        if len(self.buffer_dist[cell_id]) == 0: return
-
-        idx = np.argsort(self.buffer_dist[cell_id])
-        if self.cell_size is not None:
-            self.sample_count -= max(len(idx) - self.cell_size, 0)
-            idx = idx[:self.cell_size]
-
-        # TODO: check if time-consuming here
-        self.buffer_x[cell_id], self.buffer_y[cell_id], self.buffer_dist[cell_id], self.buffer_patch_id[cell_id] = \
-            map(lambda x: list(np.array(x)[idx]), 
-                [self.buffer_x[cell_id], self.buffer_y[cell_id], self.buffer_dist[cell_id], self.buffer_patch_id[cell_id]])
+        # re-bucket all stored samples in one pass: recompute distances and cell indices w.r.t. the new origin
+        F = self.buffer_y - self.origin
+        self._rebuild(self.buffer_x, self.buffer_y, np.linalg.norm(F, axis=1), self.buffer_patch_id, self._find_cell_id(F))
 
     @abstractmethod
     def _get_graph_edges(self, valid_cells):
@@ -178,30 +178,26 @@ class BufferBase(ABC):
             approx_x: the labeled design samples, shape = (n_label, n_var)
             approx_y: the labeled performance values, shape = (n_label, n_obj)
         '''
-        # update patch ids, remove non-existing ids previously removed from buffer
-        mapping = {}
-        patch_id_count = 0
-        for cell_id in range(self.cell_num):
-            if self.buffer_patch_id[cell_id] == []: continue
-            curr_patches = self.buffer_patch_id[cell_id]
-            for i in range(len(curr_patches)):
-                if curr_patches[i] not in mapping:
-                    mapping[curr_patches[i]] = patch_id_count
-                    patch_id_count += 1
-                self.buffer_patch_id[cell_id][i] = mapping[curr_patches[i]]
+        # update patch ids, remove non-existing ids previously removed from buffer (relabeled by order of first appearance)
+        unique_ids, first_index, inverse = np.unique(self.buffer_patch_id, return_index=True, return_inverse=True)
+        mapping = np.empty(len(unique_ids), dtype=int)
+        mapping[np.argsort(first_index)] = np.arange(len(unique_ids))
+        self.buffer_patch_id = mapping[inverse.ravel()]
+        patch_id_count = len(unique_ids)
 
         # construct unary and pairwise energy (cost) matrix for graph-cut
         # NOTE: delta_b should be set properly
-        valid_cells = np.where([self.buffer_dist[cell_id] != [] for cell_id in range(self.cell_num)])[0] # non-empty cells
+        cell_sizes = self._cell_sizes()
+        valid_cells = np.nonzero(cell_sizes > 0)[0] # non-empty cells
         n_node = len(valid_cells)
         n_label = patch_id_count
         unary_cost = self.C_inf * np.ones((n_node, n_label))
         pairwise_cost = -self.C_inf * np.eye(n_label)
 
-        for i, idx in enumerate(valid_cells):
-            patches, distances = np.array(self.buffer_patch_id[idx]), np.array(self.buffer_dist[idx])
-            min_dist = np.min(distances)
-            unary_cost[i, patches] = np.minimum((distances - min_dist) / self.delta_b, self.C_inf)
+        # node index of each sample, samples in each cell are sorted so the minimum distance is the first one
+        node_ids = np.repeat(np.arange(n_node), cell_sizes[valid_cells])
+        min_dists = self.buffer_dist[self.cell_start[valid_cells]]
+        unary_cost[node_ids, self.buffer_patch_id] = np.minimum((self.buffer_dist - min_dists[node_ids]) / self.delta_b, self.C_inf)
         
         # get edge information (graph structure)
         edges = self._get_graph_edges(valid_cells)
@@ -214,29 +210,22 @@ class BufferBase(ABC):
         labels_opt = cut_from_graph(edges, unary_cost, pairwise_cost, label_cost)
 
         # find corresponding design and performance values of optimized labels for each valid cell
-        approx_xs, approx_ys = [], []
-        labels = [] # for a certain cell, there could be no sample belongs to that label, probably due to the randomness of sampling or improper energy definition
-        for idx, label in zip(valid_cells, labels_opt):
-            for cell_patch_id, cell_x, cell_y in zip(self.buffer_patch_id[idx], self.buffer_x[idx], self.buffer_y[idx]):
-                # since each buffer element array is sorted based on distance to origin
-                if cell_patch_id == label:
-                    approx_xs.append(cell_x)
-                    approx_ys.append(cell_y)
-                    labels.append(label)
-                    break
-            else: # TODO: check
-                approx_xs.append(self.buffer_x[idx][0])
-                approx_ys.append(self.buffer_y[idx][0])
-                labels.append(label)
-        approx_xs, approx_ys = np.array(approx_xs), np.array(approx_ys)
+        # since each cell is sorted based on distance to origin, take the first sample with the label, otherwise the first sample
+        # NOTE: for a certain cell, there could be no sample belongs to that label, probably due to the randomness of sampling or improper energy definition
+        n_sample = len(self.buffer_dist)
+        match_index = np.where(self.buffer_patch_id == labels_opt[node_ids], np.arange(n_sample), n_sample)
+        selected = np.minimum.reduceat(match_index, self.cell_start[valid_cells])
+        selected = np.where(selected < n_sample, selected, self.cell_start[valid_cells])
+        labels = list(labels_opt)
+        approx_xs, approx_ys = self.buffer_x[selected], self.buffer_y[selected]
 
         # NOTE: uncomment code below to show visualization of graph cut
         # import matplotlib.pyplot as plt
         # from matplotlib import cm
         # cmap = cm.get_cmap('tab20', patch_id_count)
         # fig, axs = plt.subplots(1, 2, sharex=True, sharey=True)
-        # buffer_ys = np.vstack([np.vstack(cell_y) for cell_y in self.buffer_y if cell_y != []])
-        # buffer_patch_ids = np.concatenate([cell_patch_id for cell_patch_id in np.array(self.buffer_patch_id)[valid_cells]])
+        # buffer_ys = self.buffer_y
+        # buffer_patch_ids = self.buffer_patch_id
         # colors = [cmap(patch_id) for patch_id in buffer_patch_ids]
         # axs[0].scatter(*buffer_ys.T, s=10, c=colors)
         # axs[0].set_title('Before graph cut')
@@ -252,13 +241,7 @@ class BufferBase(ABC):
         '''
         Return flattened x and y arrays from all the cells.
         '''
-        flattened_x, flattened_y = [], []
-        for cell_x, cell_y in zip(self.buffer_x, self.buffer_y):
-            if cell_x != []:
-                flattened_x.append(cell_x)
-            if cell_y != []:
-                flattened_y.append(cell_y)
-        return np.concatenate(flattened_x), np.concatenate(flattened_y)
+        return self.buffer_x.copy(), self.buffer_y.copy()
 
 
 class Buffer2D(BufferBase):
@@ -317,9 +300,8 @@ class Buffer3D(BufferBase):
         # ax.view_init(azim=45)
         # for vec in self.cell_vecs:
         #     ax.plot(*np.array([self.origin, self.origin + vec]).T, color='gray', linewidth=1, alpha=0.5)
-        # for cell_y in self.buffer_y:
-        #     if cell_y == []: continue
-        #     ax.scatter(*np.array(cell_y).T)
+        # for cell_id in valid_cells:
+        #     ax.scatter(*self.buffer_y[self.cell_start[cell_id]:self.cell_start[cell_id + 1]].T)
         # plt.title(f'# samples: {self.sample_count}, # valid cells: {len(valid_cells)}')
         # plt.show()
 
@@ -11,6 +11,7 @@ import sys
 from .buffer import get_buffer
 from .utils import propose_next_batch, propose_next_batch_without_label, get_sample_num_from_families
 from ..solver import Solver
+from ..worker_pool import WorkerPool
 
 
 def _local_optimization(x, y, f, eval_func, bounds, delta_s):
@@ -52,6 +53,82 @@ def _local_optimization(x, y, f, eval_func, bounds, delta_s):
     return x_opt
 
 
+def _local_optimization_batch(xs, ys, fs, eval_func, bounds, delta_s, max_iter=1000, c1=1e-4, pgtol=1e-5, ftol=2.2e-9):
+    '''
+    Batched version of _local_optimization(), where all samples are optimized simultaneously by projected gradient descent
+    with Barzilai-Borwein step sizes and Armijo backtracking, each sample having its own step size and convergence mask.
+    Every iteration evaluates the performance and jacobian of all unconverged samples in one call.
+    Input:
+        xs: design samples, shape = (N, n_var)
+        ys: performance of xs, shape = (N, n_obj)
+        fs: relative performance to the buffer origin, shape = (N, n_obj)
+        eval_func: problem's evaluation function
+        bounds: problem's lower and upper bounds, shape = (2, n_var)
+        delta_s: scaling factor for choosing reference point in local optimization, see section 6.2.3
+        max_iter: maximum number of iterations (including backtracking steps)
+        c1: armijo condition constant
+        pgtol, ftol: tolerances of projected gradient and relative objective decrease to stop, same defaults as L-BFGS-B
+    Output:
+        x_opts: locally optimized samples, shape = (N, n_var)
+    '''
+    lower_bound, upper_bound = np.array(bounds[0]), np.array(bounds[1])
+    eps = 1e-12
+
+    # choose reference points z, same as _local_optimization()
+    f_norm = np.linalg.norm(fs, axis=1, keepdims=True)
+    s = 2.0 * fs / np.sum(fs, axis=1, keepdims=True) - 1 - fs / f_norm
+    s /= np.linalg.norm(s, axis=1, keepdims=True)
+    z = ys + s * delta_s * f_norm
+
+    def fun_and_grad(x, z):
+        # objective of eq(4) and its gradient
+        F, dF = eval_func(x, return_values_of=['F', 'dF'])
+        diff = F - z
+        obj = np.linalg.norm(diff, axis=1)
+        grad = np.einsum('no,nov->nv', diff / np.maximum(obj, eps)[:, None], dF)
+        return obj, grad
+
+    x = np.clip(xs, lower_bound, upper_bound)
+    obj, grad = fun_and_grad(x, z)
+
+    # initial step sizes move each sample by 10% of the design space diagonal along its gradient, then adapted by BB
+    step_max = 1e10
+    step_min = 1e-20
+    step = 0.1 * np.linalg.norm(upper_bound - lower_bound) / np.maximum(np.linalg.norm(grad, axis=1), eps)
+    active = np.linalg.norm(x - np.clip(x - grad, lower_bound, upper_bound), ord=np.inf, axis=1) > pgtol
+
+    for _ in range(max_iter):
+        idx = np.where(active)[0]
+        if len(idx) == 0:
+            break
+
+        # projected gradient step and armijo condition of all active samples
+        x_trial = np.clip(x[idx] - step[idx, None] * grad[idx], lower_bound, upper_bound)
+        obj_trial, grad_trial = fun_and_grad(x_trial, z[idx])
+        dx = x_trial - x[idx]
+        accept = obj_trial <= obj[idx] + c1 * np.sum(grad[idx] * dx, axis=1)
+
+        # backtrack rejected samples, stop when the step is too small to make progress
+        reject_idx = idx[~accept]
+        step[reject_idx] *= 0.5
+        active[reject_idx[step[reject_idx] < step_min]] = False
+
+        # move accepted samples and update their step sizes by BB rule (previous step is kept if curvature is not positive)
+        acc_idx = idx[accept]
+        dx, dgrad = dx[accept], grad_trial[accept] - grad[acc_idx]
+        sy = np.sum(dx * dgrad, axis=1)
+        step[acc_idx] = np.clip(np.where(sy > 0, np.sum(dx * dx, axis=1) / np.maximum(sy, eps), step[acc_idx]), step_min, step_max)
+        obj_prev = obj[acc_idx]
+        x[acc_idx], obj[acc_idx], grad[acc_idx] = x_trial[accept], obj_trial[accept], grad_trial[accept]
+
+        # convergence by projected gradient or relative objective decrease
+        pg_norm = np.linalg.norm(x[acc_idx] - np.clip(x[acc_idx] - grad[acc_idx], lower_bound, upper_bound), ord=np.inf, axis=1)
+        f_converged = obj_prev - obj[acc_idx] <= ftol * np.maximum(np.maximum(obj_prev, obj[acc_idx]), 1.0)
+        active[acc_idx[np.logical_or(pg_norm <= pgtol, f_converged)]] = False
+
+    return x
+
+
 def _get_kkt_dual_variables(F, G, DF, DG):
     '''
     Optimizing for dual variables alpha and beta in KKT conditions, see section 4.2, proposition 4.5.
@@ -277,7 +354,179 @@ def _first_order_approximation(x_opt, directions, bounds, n_grid_sample):
     return x_samples
 
 
-def _pareto_discover(xs, eval_func, bounds, delta_s, origin, origin_constant, n_grid_sample, queue):
+def _project_simplex(v):
+    '''
+    Euclidean projection of each row of v onto the probability simplex (sort-based), shape = (N, k)
+    '''
+    u = -np.sort(-v, axis=1)
+    css = np.cumsum(u, axis=1) - 1.0
+    ind = np.arange(1, v.shape[1] + 1)
+    rho = np.sum(u - css / ind > 0, axis=1) - 1
+    theta = css[np.arange(len(v)), rho] / (rho + 1)
+    return np.maximum(v - theta[:, None], 0.0)
+
+
+def _get_kkt_dual_variables_batch(DF, upper_active, lower_active, max_iter=500, tol=1e-12):
+    '''
+    Batched version of _get_kkt_dual_variables() for box constraints, by accelerated projected gradient on all samples at once.
+    Since active box constraints are +/- unit vectors, the optimal beta for fixed alpha is known in closed form
+    (beta_j = max(0, -g_j) for upper active, max(0, g_j) for lower active, where g = alpha @ DF),
+    so only alpha is optimized on the simplex, minimizing 0.5 * |r|^2 where r is g with the active parts absorbed by beta.
+    Input:
+        DF: jacobian matrices of performance, shape = (N, n_obj, n_var)
+        upper_active, lower_active: masks of active upper and lower box constraints, shape = (N, n_var)
+        max_iter: maximum number of iterations
+        tol: tolerance of alpha change to stop
+    Output:
+        alpha_opt: optimized dual variables alpha, shape = (N, n_obj)
+    '''
+    n_sample, n_obj = DF.shape[:2]
+    lower_active = np.logical_and(lower_active, ~upper_active) # same precedence as _get_box_const_value_jacobian_hessian()
+
+    def residual(alpha):
+        g = np.einsum('no,nov->nv', alpha, DF)
+        g = np.where(upper_active, np.maximum(g, 0.0), g)
+        return np.where(lower_active, np.minimum(g, 0.0), g)
+
+    # NOTE: random initialization as _get_kkt_dual_variables(), step size from the lipschitz bound of the gradient
+    alpha = np.random.random((n_sample, n_obj))
+    alpha /= np.sum(alpha, axis=1, keepdims=True)
+    step = 1.0 / np.maximum(np.sum(DF ** 2, axis=(1, 2)), 1e-12)[:, None]
+    z, t = alpha.copy(), 1.0
+    for _ in range(max_iter):
+        grad = np.einsum('nov,nv->no', DF, residual(z))
+        alpha_next = _project_simplex(z - step * grad)
+        t_next = 0.5 * (1 + np.sqrt(1 + 4 * t ** 2))
+        z = alpha_next + (t - 1) / t_next * (alpha_next - alpha)
+        converged = np.max(np.abs(alpha_next - alpha)) < tol
+        alpha, t = alpha_next, t_next
+        if converged:
+            break
+    return alpha
+
+
+def _get_optimization_directions_batch(x_opts, eval_func, bounds):
+    '''
+    Batched version of _get_optimization_directions(), with one evaluation for all samples and stacked null space computations.
+    Input:
+        x_opts: locally optimized design samples, shape = (N, n_var)
+        eval_func: problem's evaluation function
+        bounds: problem's lower and upper bounds, shape = (2, n_var)
+    Output:
+        d_xs: list of local exploration directions for x (design sample) of each sample, shape = (n_var, n_direction) each
+    '''
+    n_sample, n_var = x_opts.shape
+    _, DF, HF = eval_func(x_opts, return_values_of=['F', 'dF', 'hF'])
+    n_obj = DF.shape[1]
+
+    eps = 1e-8 # epsilon value to determine 'active', same as _get_active_box_const()
+    upper_active = bounds[1] - x_opts < eps
+    lower_active = x_opts - bounds[0] < eps
+    active = np.logical_or(upper_active, lower_active)
+    alpha = _get_kkt_dual_variables_batch(DF, upper_active, lower_active)
+    H = np.einsum('nkji,nk->nij', HF, alpha) # same as HF.T @ alpha for each sample
+
+    # samples with the same number of active constraints share the shape of the matrix in eq(3), whose null spaces are stacked
+    d_xs = [None] * n_sample
+    n_active = np.sum(active, axis=1)
+    for n_active_const in np.unique(n_active):
+        idx = np.where(n_active == n_active_const)[0]
+        n_group, n_col = len(idx), n_obj + n_active_const + n_var
+
+        # active constraint indices of each sample, in ascending order as _get_box_const_value_jacobian_hessian()
+        active_idx = np.argsort(~active[idx], axis=1, kind='stable')[:, :n_active_const]
+        DG = np.zeros((n_group, n_active_const, n_var))
+        sign = np.where(np.take_along_axis(upper_active[idx], active_idx, axis=1), 1.0, -1.0)
+        np.put_along_axis(DG, active_idx[:, :, None], sign[:, :, None], axis=2)
+
+        DxHx = np.zeros((n_group, 1 + n_active_const + n_var, n_col))
+        DxHx[:, 0, :n_obj] = 1.0
+        DxHx[:, 1:1 + n_active_const, n_obj + n_active_const:] = DG
+        DxHx[:, 1 + n_active_const:, :n_obj] = np.transpose(DF[idx], (0, 2, 1))
+        DxHx[:, 1 + n_active_const:, n_obj:n_obj + n_active_const] = np.transpose(DG, (0, 2, 1))
+        DxHx[:, 1 + n_active_const:, n_obj + n_active_const:] = H[idx]
+
+        # null space by stacked svd, with the same rank tolerance as scipy.linalg.null_space
+        _, s, vh = np.linalg.svd(DxHx, full_matrices=True)
+        rcond = np.finfo(s.dtype).eps * max(DxHx.shape[1:])
+        rank = np.sum(s > np.max(s, axis=1, keepdims=True) * rcond, axis=1)
+        for j, (i, r) in enumerate(zip(idx, rank)):
+            directions = vh[j, r:].T
+            directions[np.abs(directions) < eps] = 0.0 # eliminate numerical error
+            d_xs[i] = directions[-n_var:]
+    return d_xs
+
+
+def _first_order_approximation_batch(x_opts, d_xs, bounds, n_obj, n_grid_sample, max_loop=10):
+    '''
+    Batched version of _first_order_approximation(), where grid samples of all samples are generated and checked at once.
+    Input:
+        x_opts: locally optimized design samples, shape = (N, n_var)
+        d_xs: list of local exploration directions for x of each sample, see _get_optimization_directions_batch()
+        bounds: problem's lower and upper bounds, shape = (2, n_var)
+        n_obj: number of objectives
+        n_grid_sample: number of samples on local manifold (grid), see section 6.3.1
+        max_loop: maximum number of extra sampling rounds, to avoid infinite loop when it's hard to get valid samples
+    Output:
+        x_samples_all: list of new valid samples from local manifold (grid) of each sample, starting with the sample itself
+    '''
+    lower_bound, upper_bound = bounds[0], bounds[1]
+    eps = 1e-8
+    x_samples_all = [np.array([x_opt]) for x_opt in x_opts]
+
+    # choose d-1 normalized directions of each sample to expand, same rules as _first_order_approximation()
+    expand_idx, d_x_expand = [], []
+    for i, d_x in enumerate(d_xs):
+        direction_dim = d_x.shape[1]
+        if np.linalg.norm(d_x) < eps or direction_dim < n_obj - 1:
+            continue
+        if direction_dim > n_obj - 1:
+            indices = np.random.choice(np.arange(direction_dim), n_obj - 1)
+            while np.linalg.norm(d_x[:, indices]) < eps:
+                indices = np.random.choice(np.arange(direction_dim), n_obj - 1)
+            d_x = d_x[:, indices]
+        expand_idx.append(i)
+        d_x_expand.append(d_x / np.linalg.norm(d_x))
+    if len(expand_idx) == 0:
+        return x_samples_all
+    d_x_expand = np.array(d_x_expand) * np.expand_dims(upper_bound - lower_bound, axis=1) # shape = (M, n_var, n_obj - 1)
+    x_expand = x_opts[expand_idx]
+
+    # grid sampling on expanded surfaces, each round draws n_grid_sample candidates for all samples not having enough valid ones
+    n_valid = np.ones(len(expand_idx), dtype=int)
+    valid_samples = [[] for _ in expand_idx]
+    unfinished = np.arange(len(expand_idx))
+    for _ in range(max_loop + 1):
+        unfinished = unfinished[n_valid[unfinished] < n_grid_sample]
+        if len(unfinished) == 0:
+            break
+        curr_dx_samples = np.einsum('mvk,mgk->mgv', d_x_expand[unfinished], np.random.random((len(unfinished), n_grid_sample, n_obj - 1)))
+        curr_x_samples = np.expand_dims(x_expand[unfinished], axis=1) + curr_dx_samples # shape = (M, n_grid_sample, n_var)
+        valid = np.logical_and((curr_x_samples <= upper_bound).all(axis=2), (curr_x_samples >= lower_bound).all(axis=2))
+        n_valid[unfinished] += np.sum(valid, axis=1)
+        for j, m in enumerate(unfinished):
+            valid_samples[m].append(curr_x_samples[j][valid[j]])
+
+    for m, i in enumerate(expand_idx):
+        x_samples_all[i] = np.vstack([x_samples_all[i]] + valid_samples[m])[:n_grid_sample]
+    return x_samples_all
+
+
+def _pareto_discover(xs, eval_func, bounds, delta_s, origin, origin_constant, n_grid_sample, batched_expansion, queue):
+    '''
+    Parallel worker of a newly started process, results of _pareto_discover_batch() are stored in queue
+    '''
+    queue.put(_pareto_discover_batch(xs, eval_func, bounds, delta_s, origin, origin_constant, n_grid_sample, batched_expansion))
+
+
+def _pareto_discover_task(problem, xs, bounds, delta_s, origin, origin_constant, n_grid_sample, batched_expansion):
+    '''
+    Task of the persistent worker pool, where the problem is already set in the worker
+    '''
+    return _pareto_discover_batch(xs, problem.evaluate, bounds, delta_s, origin, origin_constant, n_grid_sample, batched_expansion)
+
+
+def _pareto_discover_batch(xs, eval_func, bounds, delta_s, origin, origin_constant, n_grid_sample, batched_expansion=False):
     '''
     Local optimization and first-order approximation.
     (We move these functions out from the ParetoDiscovery class for parallelization)
@@ -289,8 +538,8 @@ def _pareto_discover(xs, eval_func, bounds, delta_s, origin, origin_constant, n_
         origin: origin of performance buffer
         origin_constant: when evaluted value surpasses the buffer origin, adjust the origin accordingly and subtract this constant
         n_grid_sample: number of samples on local manifold (grid), see section 6.3.1
-        queue: the queue storing results from all processes
-    Output (stored in queue):
+        batched_expansion: whether to run local optimization, compute directions and grid samples of all samples at once
+    Output:
         x_samples_all: all valid samples from local manifold (grid)
         patch_ids: patch ids for all valid samples (same id when expanded from same x)
         sample_num: number of input samples (needed for counting global patch ids)
@@ -303,6 +552,19 @@ def _pareto_discover(xs, eval_func, bounds, delta_s, origin, origin_constant, n_
         new_origin -= origin_constant
     fs = ys - new_origin
 
+    if batched_expansion:
+        # local optimization by optimizing eq(4), for all samples at once if the jacobian is available
+        if eval_func(xs[:1], return_values_of=['dF']) is None:
+            x_opts = np.array([_local_optimization(x, y, f, eval_func, bounds, delta_s) for x, y, f in zip(xs, ys, fs)])
+        else:
+            x_opts = _local_optimization_batch(xs, ys, fs, eval_func, bounds, delta_s)
+
+        # get directions to expand in local manifold and new valid samples from local manifold, for all samples at once
+        d_xs = _get_optimization_directions_batch(x_opts, eval_func, bounds)
+        x_samples_all = _first_order_approximation_batch(x_opts, d_xs, bounds, ys.shape[1], n_grid_sample)
+        patch_ids = np.repeat(np.arange(len(xs)), [len(x_samples) for x_samples in x_samples_all]).tolist()
+        return [np.vstack(x_samples_all), patch_ids, len(xs), new_origin]
+
     x_samples_all = []
     patch_ids = []
     for i, (x, y, f) in enumerate(zip(xs, ys, fs)):
@@ -318,7 +580,7 @@ def _pareto_discover(xs, eval_func, bounds, delta_s, origin, origin_constant, n_
         x_samples_all.append(x_samples)
         patch_ids.extend([i] * len(x_samples))
 
-    queue.put([np.vstack(x_samples_all), patch_ids, len(xs), new_origin])
+    return [np.vstack(x_samples_all), patch_ids, len(xs), new_origin]
 
 
 class ParetoDiscovery(Algorithm):
@@ -342,6 +604,8 @@ class ParetoDiscovery(Algorithm):
                 delta_s=0.3,
                 n_grid_sample=1000,
                 n_process=cpu_count(),
+                worker_pool=None,
+                batched_expansion=False,
                 **kwargs
                 ):
         '''
@@ -358,6 +622,8 @@ class ParetoDiscovery(Algorithm):
             delta_s: scaling factor for choosing reference point in local optimization, see section 6.2.3
             n_grid_sample: number of samples on local manifold (grid), see section 6.3.1
             n_process: number of processes for parallelization
+            worker_pool: persistent worker pool with the problem set (see mobo/solver/worker_pool.py), new processes are started every generation if None
+            batched_expansion: whether to run local optimization, compute exploration directions and grid samples of all samples at once
         '''
         super().__init__(**kwargs)
         
@@ -400,6 +666,8 @@ class ParetoDiscovery(Algorithm):
         self.delta_s = delta_s
         self.n_grid_sample = n_grid_sample
         self.n_process = n_process
+        self.worker_pool = worker_pool
+        self.batched_expansion = batched_expansion
         self.patch_id = 0
 
     def _initialize(self):
@@ -450,25 +718,25 @@ class ParetoDiscovery(Algorithm):
         # stochastic sampling by adding local perturbance
         xs = self._stochastic_sampling()
 
-        # parallelize core pareto discovery process by multiprocessing, see _pareto_discover()
+        # parallelize core pareto discovery process by multiprocessing, see _pareto_discover_batch()
         # including select_direction, local_optimization, first_order_approximation in above algorithm illustration
-        x_batch = np.array_split(xs, self.n_process)
-        queue = Queue()
-        process_count = 0
-        for x in x_batch:
-            if len(x) > 0:
-                p = Process(target=_pareto_discover, 
-                    args=(x, self.problem.evaluate, [self.problem.xl, self.problem.xu], self.delta_s, 
-                        self.buffer.origin, self.buffer.origin_constant, self.n_grid_sample, queue))
-                p.start()
-                process_count += 1
+        x_batch = [x for x in np.array_split(xs, self.n_process) if len(x) > 0]
+        args = ([self.problem.xl, self.problem.xu], self.delta_s, self.buffer.origin, self.buffer.origin_constant, self.n_grid_sample,
+            self.batched_expansion)
+        if self.worker_pool is not None:
+            # only x-batches are shipped, the problem is already set in the persistent workers
+            results = self.worker_pool.map(_pareto_discover_task, [(x, *args) for x in x_batch])
+        else:
+            queue = Queue()
+            for x in x_batch:
+                Process(target=_pareto_discover, args=(x, self.problem.evaluate, *args, queue)).start()
+            results = [queue.get() for _ in x_batch]
 
         # gather results (new samples, new patch ids, new origin of performance buffer) from parallel discovery
         new_origin = self.buffer.origin
         x_samples_all = []
         patch_ids_all = []
-        for _ in range(process_count):
-            x_samples, patch_ids, sample_num, origin = queue.get()
+        for x_samples, patch_ids, sample_num, origin in results:
             if x_samples is not None:
                 x_samples_all.append(x_samples)
                 patch_ids_all.append(np.array(patch_ids) + self.patch_id) # assign corresponding global patch ids to samples
@@ -507,7 +775,7 @@ class ParetoDiscovery(Algorithm):
         xs = np.clip(xs, self.problem.xl, self.problem.xu)
         return xs
 
-    def propose_next_batch(self, curr_pfront, ref_point, batch_size, transformation):
+    def propose_next_batch(self, curr_pfront, ref_point, batch_size, transformation, lazy_greedy=False):
         '''
         Propose next batch to evaluate for active learning. 
         Greedely propose sample with max HV until all families ar visited. Allow only samples with max HV from unvisited family.
@@ -521,7 +789,7 @@ class ParetoDiscovery(Algorithm):
         
         if len(approx_x) >= batch_size:
             # approximation result is enough to propose all candidates
-            curr_X_next, curr_Y_next, labels_next = propose_next_batch(curr_pfront, ref_point, approx_y, approx_x, batch_size, labels)
+            curr_X_next, curr_Y_next, labels_next = propose_next_batch(curr_pfront, ref_point, approx_y, approx_x, batch_size, labels, lazy_greedy)
             X_next.append(curr_X_next)
             Y_next.append(curr_Y_next)
             family_lbls.append(labels_next)
@@ -536,7 +804,7 @@ class ParetoDiscovery(Algorithm):
             remain_batch_size = batch_size - len(approx_x)
             buffer_xs, buffer_ys = self.buffer.flattened()
             buffer_xs, buffer_ys = transformation.undo(buffer_xs, buffer_ys)
-            prop_X_next, prop_Y_next = propose_next_batch_without_label(curr_pfront, ref_point, buffer_ys, buffer_xs, remain_batch_size)
+            prop_X_next, prop_Y_next = propose_next_batch_without_label(curr_pfront, ref_point, buffer_ys, buffer_xs, remain_batch_size, lazy_greedy)
             X_next.append(prop_X_next)
             Y_next.append(prop_Y_next)
             family_lbls.extend(np.full(remain_batch_size, -1))
@@ -568,4 +836,97 @@ class ParetoDiscoverySolver(Solver):
     Solver based on ParetoDiscovery
     '''
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, algo=ParetoDiscovery, **kwargs)
\ No newline at end of file
+        super().__init__(*args, algo=ParetoDiscovery, **kwargs)
+        # persistent workers reused by all generations and solves, see solve()
+        self.worker_pool = WorkerPool(self.algo_kwargs.get('n_process', cpu_count()))
+        self.algo_kwargs['worker_pool'] = self.worker_pool
+
+    def solve(self, problem, X, Y, *args, **kwargs):
+        # send the surrogate problem (fitted in this BO iteration) to the workers once, then generations only ship x-batches
+        self.worker_pool.set_problem(problem)
+        return super().solve(problem, X, Y, *args, **kwargs)
+
+if __name__ == '__main__':
+    # benchmark throughput of ParetoDiscovery._next on gp surrogates of ZDT / DTLZ problems,
+    # run by: python -m mobo.solver.pareto_discovery.pareto_discovery
+    from argparse import ArgumentParser
+    from time import time
+    from problems.common import get_problem
+    from mobo.surrogate_model import GaussianProcess
+    from mobo.acquisition import IdentityFunc
+    from mobo.transformation import StandardTransform
+    from mobo.surrogate_problem import SurrogateProblem
+    # NOTE: import from the module rather than using __main__, so that tasks of the worker pool are pickled by reference
+    from mobo.solver.pareto_discovery.pareto_discovery import ParetoDiscovery, ParetoDiscoverySolver
+    from mobo.solver.worker_pool import WorkerPool
+
+    parser = ArgumentParser()
+    parser.add_argument('--problems', type=str, nargs='+', default=['zdt1', 'dtlz2'])
+    parser.add_argument('--n-var', type=int, default=6)
+    parser.add_argument('--n-obj', type=int, default=3, help='number of objectives of DTLZ problems (ZDT problems have 2)')
+    parser.add_argument('--n-init-sample', type=int, default=50)
+    parser.add_argument('--pop-size', type=int, default=20)
+    parser.add_argument('--n-gen', type=int, default=10)
+    parser.add_argument('--n-grid-sample', type=int, default=100)
+    parser.add_argument('--n-process', type=int, default=1)
+    parser.add_argument('--worker-pool', default=False, action='store_true',
+        help='run generations on a persistent worker pool as ParetoDiscoverySolver does, instead of new processes every generation')
+    parser.add_argument('--batched-expansion', default=False, action='store_true',
+        help='run local optimization, compute exploration directions and grid samples of all samples at once')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for name in args.problems:
+        np.random.seed(args.seed)
+
+        # fit a gp surrogate on random samples of the real problem
+        if name.startswith('zdt'):
+            real_problem = get_problem(name, n_var=args.n_var)
+        else:
+            real_problem = get_problem(name, n_var=args.n_var, n_obj=args.n_obj)
+        X = real_problem.xl + np.random.random((args.n_init_sample, real_problem.n_var)) * (real_problem.xu - real_problem.xl)
+        Y = real_problem.evaluate(X, return_values_of=['F'])
+        transformation = StandardTransform([real_problem.xl, real_problem.xu])
+        transformation.fit(X, Y)
+        X, Y = transformation.do(X, Y)
+        surrogate_model = GaussianProcess(real_problem.n_var, real_problem.n_obj, nu=5)
+        surrogate_model.fit(X, Y)
+        problem = SurrogateProblem(real_problem, surrogate_model, IdentityFunc(), transformation)
+
+        worker_pool = None
+        if args.worker_pool:
+            worker_pool = WorkerPool(args.n_process)
+            worker_pool.set_problem(problem)
+
+        algo = ParetoDiscovery(pop_size=args.pop_size, sampling=X[:args.pop_size], n_grid_sample=args.n_grid_sample,
+            n_process=args.n_process, worker_pool=worker_pool, batched_expansion=args.batched_expansion)
+        algo.setup(problem, ('n_gen', args.n_gen), seed=args.seed)
+        algo.next() # initialization
+
+        # time every generation and every origin move of the performance buffer
+        t_next, t_move_origin = [], []
+        move_origin = algo.buffer.move_origin
+        def timed_move_origin(*args, **kwargs):
+            t = time()
+            move_origin(*args, **kwargs)
+            t_move_origin.append(time() - t)
+        algo.buffer.move_origin = timed_move_origin
+
+        while algo.has_next():
+            t = time()
+            algo.next()
+            t_next.append(time() - t)
+
+        print(f'{name}: n_var: {real_problem.n_var}, n_obj: {real_problem.n_obj}, buffer size: {algo.buffer.sample_count}, '
+            f'_next: {np.mean(t_next):.4f}s/gen ({len(t_next) / np.sum(t_next):.2f} gen/s), '
+            f'move_origin: {np.sum(t_move_origin):.4f}s in total over {len(t_move_origin)} calls')
+        if worker_pool is not None:
+            worker_pool.close()
+
+            # check the pool through Solver.solve as MOBO runs it, where pymoo's minimize works on a deep copy of the algorithm
+            solver = ParetoDiscoverySolver(n_gen=2, pop_init_method='nds', batch_size=args.pop_size, alpha=None, n_w=None,
+                pop_size=args.pop_size, n_grid_sample=args.n_grid_sample, n_process=args.n_process, batched_expansion=args.batched_expansion)
+            for _ in range(2): # the second solve runs on the same workers with the problem sent again
+                solution = solver.solve(problem, X, Y)
+            print(f'{name}: ParetoDiscoverySolver.solve with worker pool: {len(solution["x"])} solutions')
+            solver.worker_pool.close()
@@ -1,8 +1,8 @@
 import numpy as np
-from pymoo.factory import get_performance_indicator
+from ...hypervolume import HypervolumeImprovement, lazy_greedy_selection
 
 
-def propose_next_batch(curr_pfront, ref_point, pred_pfront, pred_pset, batch_size, labels):
+def propose_next_batch(curr_pfront, ref_point, pred_pfront, pred_pset, batch_size, labels, lazy_greedy=False):
     '''
     Propose next batch of design variables to evaluate by maximizing hypervolume contribution.
     Greedely add samples with maximum hypervolume from each family.
@@ -12,6 +12,7 @@ def propose_next_batch(curr_pfront, ref_point, pred_pfront, pred_pset, batch_siz
         pred_pset: predicted pareto set from sampled objective functions
         batch_size: batch size of design samples to be proposed
         labels: family labels for pred_pset
+        lazy_greedy: whether to use lazy greedy selection, which yields the same batch with fewer hypervolume evaluations
     Output:
         X_next: next batch of design variables to evaluate
         Y_next: expected output of next batch of design variables to evaluate
@@ -19,8 +20,7 @@ def propose_next_batch(curr_pfront, ref_point, pred_pfront, pred_pset, batch_siz
     '''
     #assert len(pred_pset) >= batch_size, "predicted pareto set is smaller than proposed batch size!"
 
-    curr_pfront = curr_pfront.copy()
-    hv = get_performance_indicator('hv', ref_point=ref_point)
+    hv = HypervolumeImprovement(curr_pfront, ref_point)
     idx_choices = np.ma.array(np.arange(len(pred_pset)), mask=False) # mask array for index choices
     iter_idx_choices = np.ma.array(np.arange(len(pred_pset)), mask=False) # mask array for index choices of unvisited family samples
     next_batch_indices = []
@@ -33,39 +33,38 @@ def propose_next_batch(curr_pfront, ref_point, pred_pfront, pred_pset, batch_siz
         next_batch_indices = [0] * (batch_size - len(pred_pset))
         batch_size = len(pred_pset)
 
-    # greedily select indices that maximize hypervolume contribution
-    for _ in range(batch_size):
-        #if all families were visited, start new cycle
-        if len(iter_idx_choices.compressed())==0:
-            iter_idx_choices = idx_choices.copy()
-        curr_hv = hv.calc(curr_pfront)
-        max_hv_contrib = 0.
-        max_hv_idx = -1
-        for idx in iter_idx_choices.compressed():
-            # calculate hypervolume contribution
-            new_hv = hv.calc(np.vstack([curr_pfront, pred_pfront[idx]]))
-            hv_contrib = new_hv - curr_hv
-            if hv_contrib > max_hv_contrib:
-                max_hv_contrib = hv_contrib
-                max_hv_idx = idx
-        if max_hv_idx == -1: # if all candidates have no hypervolume contribution, just randomly select one
-            max_hv_idx = np.random.choice(iter_idx_choices.compressed())
-
-        idx_choices.mask[max_hv_idx] = True # mask as selected
-        curr_pfront = np.vstack([curr_pfront, pred_pfront[max_hv_idx]]) # add to current pareto front
-        next_batch_indices.append(max_hv_idx)
-        family_lbls_next.append(labels[max_hv_idx])
-        #find which family to mask all family memebers as visited in this cycle
-        family_ids = np.where(labels == labels[max_hv_idx])[0]
-        for fid in family_ids:
-            iter_idx_choices.mask[fid] = True
+    if lazy_greedy:
+        selected_indices = lazy_greedy_selection(hv, pred_pfront, batch_size, labels=np.asarray(labels))
+        next_batch_indices += selected_indices
+        family_lbls_next = [labels[idx] for idx in selected_indices]
+    else:
+        # greedily select indices that maximize hypervolume contribution
+        for _ in range(batch_size):
+            #if all families were visited, start new cycle
+            if len(iter_idx_choices.compressed())==0:
+                iter_idx_choices = idx_choices.copy()
+            # calculate hypervolume contribution of all candidates at once
+            hv_contrib = hv.evaluate(pred_pfront[iter_idx_choices.compressed()])
+            if hv_contrib.max() > 0.:
+                max_hv_idx = iter_idx_choices.compressed()[np.argmax(hv_contrib)]
+            else: # if all candidates have no hypervolume contribution, just randomly select one
+                max_hv_idx = np.random.choice(iter_idx_choices.compressed())
+
+            idx_choices.mask[max_hv_idx] = True # mask as selected
+            hv.update(pred_pfront[max_hv_idx]) # add to current pareto front
+            next_batch_indices.append(max_hv_idx)
+            family_lbls_next.append(labels[max_hv_idx])
+            #find which family to mask all family memebers as visited in this cycle
+            family_ids = np.where(labels == labels[max_hv_idx])[0]
+            for fid in family_ids:
+                iter_idx_choices.mask[fid] = True
 
     X_next = pred_pset[next_batch_indices].copy()
     Y_next = pred_pfront[next_batch_indices].copy()
     return X_next, Y_next, family_lbls_next
 
 
-def propose_next_batch_without_label(curr_pfront, ref_point, pred_pfront, pred_pset, batch_size):
+def propose_next_batch_without_label(curr_pfront, ref_point, pred_pfront, pred_pset, batch_size, lazy_greedy=False):
     '''
     Propose next batch of design variables to evaluate by maximizing hypervolume contribution
     Input:
@@ -73,13 +72,13 @@ def propose_next_batch_without_label(curr_pfront, ref_point, pred_pfront, pred_p
         pred_pfront: predicted pareto front from sampled objective functions
         pred_pset: predicted pareto set from sampled objective functions
         batch_size: batch size of design samples to be proposed
+        lazy_greedy: whether to use lazy greedy selection, which yields the same batch with fewer hypervolume evaluations
     Output:
         X_next: next batch of design variables to evaluate
     '''
     #assert len(pred_pset) >= batch_size, "predicted pareto set is smaller than proposed batch size!
 
-    curr_pfront = curr_pfront.copy()
-    hv = get_performance_indicator('hv', ref_point=ref_point)
+    hv = HypervolumeImprovement(curr_pfront, ref_point)
     idx_choices = np.ma.array(np.arange(len(pred_pset)), mask=False) # mask array for index choices
     next_batch_indices = []
 
@@ -88,24 +87,21 @@ def propose_next_batch_without_label(curr_pfront, ref_point, pred_pfront, pred_p
         next_batch_indices = [0] * (batch_size - len(pred_pset))
         batch_size = len(pred_pset)
 
-    # greedily select indices that maximize hypervolume contribution
-    for _ in range(batch_size):
-        curr_hv = hv.calc(curr_pfront)
-        max_hv_contrib = 0.
-        max_hv_idx = -1
-        for idx in idx_choices.compressed():
-            # calculate hypervolume contribution
-            new_hv = hv.calc(np.vstack([curr_pfront, pred_pfront[idx]]))
-            hv_contrib = new_hv - curr_hv
-            if hv_contrib > max_hv_contrib:
-                max_hv_contrib = hv_contrib
-                max_hv_idx = idx
-        if max_hv_idx == -1: # if all candidates have no hypervolume contribution, just randomly select one
-            max_hv_idx = np.random.choice(idx_choices.compressed())
-
-        idx_choices.mask[max_hv_idx] = True # mask as selected
-        curr_pfront = np.vstack([curr_pfront, pred_pfront[max_hv_idx]]) # add to current pareto front
-        next_batch_indices.append(max_hv_idx)
+    if lazy_greedy:
+        next_batch_indices += lazy_greedy_selection(hv, pred_pfront, batch_size)
+    else:
+        # greedily select indices that maximize hypervolume contribution
+        for _ in range(batch_size):
+            # calculate hypervolume contribution of all remaining candidates at once
+            hv_contrib = hv.evaluate(pred_pfront[idx_choices.compressed()])
+            if hv_contrib.max() > 0.:
+                max_hv_idx = idx_choices.compressed()[np.argmax(hv_contrib)]
+            else: # if all candidates have no hypervolume contribution, just randomly select one
+                max_hv_idx = np.random.choice(idx_choices.compressed())
+
+            idx_choices.mask[max_hv_idx] = True # mask as selected
+            hv.update(pred_pfront[max_hv_idx]) # add to current pareto front
+            next_batch_indices.append(max_hv_idx)
 
     X_next = pred_pset[next_batch_indices].copy()
     Y_next = pred_pfront[next_batch_indices].copy()
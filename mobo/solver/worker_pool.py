@@ -0,0 +1,194 @@
+import io
+import gc
+import atexit
+import pickle
+import traceback
+import numpy as np
+from multiprocessing import Process, Queue
+from multiprocessing.shared_memory import SharedMemory
+
+'''
+Persistent worker pool for solvers that run many parallel tasks on the same surrogate problem (ParetoDiscovery, ParEGO).
+Workers are started once and reused across generations and BO iterations. The problem is sent to workers once per BO iteration,
+its large numpy arrays (e.g. GP training data, cholesky factors) are placed in shared memory instead of being pickled,
+then only task arguments (e.g. x-batches) are shipped.
+'''
+
+# numpy arrays with at least this many bytes are placed in shared memory when sending the problem
+SHARED_ARRAY_MIN_BYTES = 4096
+
+# shared memory blocks attached by the current worker process, kept open while the problem using them is alive
+_attached_blocks = []
+
+
+def _attach_shared_array(name, shape, dtype):
+    '''
+    Reconstruct a (read-only) numpy array from a shared memory block, called when unpickling the problem in a worker
+    '''
+    block = SharedMemory(name=name)
+    _attached_blocks.append(block)
+    array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+
+class _SharedArrayPickler(pickle.Pickler):
+    '''
+    Pickler that places large numpy arrays in shared memory blocks and pickles references to them
+    '''
+    def __init__(self, file, blocks):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.blocks = blocks
+        self.shared = {} # id(array) -> reference, arrays referenced multiple times (e.g. gp cache) are shared once
+        self.arrays = [] # keep arrays alive while pickling so that ids are not reused
+
+    def reducer_override(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes < SHARED_ARRAY_MIN_BYTES:
+            return NotImplemented
+        if id(obj) not in self.shared:
+            block = SharedMemory(create=True, size=obj.nbytes)
+            np.ndarray(obj.shape, dtype=obj.dtype, buffer=block.buf)[...] = obj
+            self.blocks.append(block)
+            self.arrays.append(obj)
+            self.shared[id(obj)] = (_attach_shared_array, (block.name, obj.shape, obj.dtype.str))
+        return self.shared[id(obj)]
+
+
+def _release_attached_blocks():
+    '''
+    Close shared memory blocks of the previous problem in a worker, blocks still referenced by live arrays are left open
+    '''
+    gc.collect()
+    for block in _attached_blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass
+    _attached_blocks.clear()
+
+
+def _worker(control_queue, task_queue, result_queue):
+    '''
+    Worker loop: tasks are tagged with the version of the problem they run on,
+    the problem of a new version is read from this worker's control queue when its first task arrives
+    '''
+    version, problem = None, None
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_version, idx, func, args, seed = pickle.loads(task)
+        try:
+            # NOTE: skip problems of versions this worker never got a task of, their shared memory might be released already
+            while version != task_version:
+                version, payload = control_queue.get()
+                if version == task_version:
+                    problem = None
+                    _release_attached_blocks()
+                    problem = pickle.loads(payload)
+            np.random.seed(seed)
+            result_queue.put([idx, func(problem, *args), None])
+        except Exception:
+            result_queue.put([idx, None, traceback.format_exc()])
+
+
+class WorkerPool:
+    '''
+    Pool of persistent worker processes running tasks of the form func(problem, *args)
+    '''
+    def __init__(self, n_process):
+        '''
+        Input:
+            n_process: number of worker processes, started lazily on the first task
+        '''
+        self.n_process = n_process
+        self.workers = []
+        self.control_queues = []
+        self.task_queue = None
+        self.result_queue = None
+        self.version = 0 # version of the current problem, 0 means no problem set yet
+        self.payload = None
+        self.blocks = [] # shared memory blocks of the current problem
+
+    def _start(self):
+        self.task_queue, self.result_queue = Queue(), Queue()
+        for _ in range(self.n_process):
+            control_queue = Queue()
+            worker = Process(target=_worker, args=(control_queue, self.task_queue, self.result_queue))
+            worker.start()
+            self.workers.append(worker)
+            self.control_queues.append(control_queue)
+        # NOTE: workers are not daemonic so that tasks can start processes themselves, hence they are stopped explicitly at exit
+        atexit.register(self.close)
+
+    def set_problem(self, problem):
+        '''
+        Set the problem for subsequent tasks (e.g. once per BO iteration after the surrogate model is fitted).
+        The problem is pickled once here, sent to each worker at most once when it receives the first task on it.
+        '''
+        self._release_blocks()
+        buffer = io.BytesIO()
+        _SharedArrayPickler(buffer, self.blocks).dump(problem)
+        self.payload = buffer.getvalue()
+        self.version += 1
+        for control_queue in self.control_queues:
+            control_queue.put([self.version, self.payload])
+
+    def map(self, func, args_list):
+        '''
+        Run func(problem, *args) for each args in args_list on the workers, returns results in the order of args_list.
+        Seeds of the tasks are drawn from the global random state, so that results are reproducible and differ among tasks.
+        '''
+        assert self.version > 0, 'problem must be set first before running tasks'
+        if len(self.workers) == 0:
+            self._start()
+            for control_queue in self.control_queues:
+                control_queue.put([self.version, self.payload])
+
+        # NOTE: tasks are pickled here rather than in the feeder thread of the queue, which would only print pickling errors and hang
+        seeds = np.random.randint(np.iinfo(np.int32).max, size=len(args_list))
+        tasks = [pickle.dumps([self.version, idx, func, tuple(args), seed], protocol=pickle.HIGHEST_PROTOCOL)
+            for idx, (args, seed) in enumerate(zip(args_list, seeds))]
+        for task in tasks:
+            self.task_queue.put(task)
+
+        results = [None] * len(args_list)
+        errors = []
+        for _ in range(len(args_list)):
+            idx, result, error = self.result_queue.get()
+            results[idx] = result
+            if error is not None:
+                errors.append(error)
+        if len(errors) > 0:
+            raise RuntimeError(f'task failed in worker process:\n{errors[0]}')
+        return results
+
+    def _release_blocks(self):
+        # NOTE: workers still attached keep their mappings valid after unlinking until they load the next problem
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def close(self):
+        '''
+        Stop all workers and release shared memory
+        '''
+        if len(self.workers) > 0:
+            for _ in self.workers:
+                self.task_queue.put(None)
+            for worker in self.workers:
+                worker.join()
+            self.workers, self.control_queues = [], []
+            atexit.unregister(self.close)
+        self._release_blocks()
+        self.version, self.payload = 0, None
+
+    def __deepcopy__(self, memo):
+        # NOTE: copies of solvers or algorithms holding the pool (e.g. pymoo's minimize copies the algorithm) share it with its problem set
+        return self
+
+    def __getstate__(self):
+        # NOTE: processes and shared memory cannot be pickled, e.g. when a solver holding the pool is deep copied
+        return {'n_process': self.n_process, 'workers': [], 'control_queues': [], 'task_queue': None, 'result_queue': None,
+            'version': 0, 'payload': None, 'blocks': []}
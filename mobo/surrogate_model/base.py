@@ -8,9 +8,25 @@ class SurrogateModel(ABC):
     '''
     Base class of surrogate model
     '''
-    def __init__(self, n_var, n_obj):
+    def __init__(self, n_var, n_obj, warm_start=False, refit_interval=1, **kwargs):
         self.n_var = n_var
         self.n_obj = n_obj
+        self.warm_start = warm_start # initialize hyperparameter optimization from the previous optimum
+        self.refit_interval = refit_interval # optimize hyperparameters every refit_interval fits, otherwise only condition on new data
+        self.n_fit = 0 # number of fits done
+
+    def need_optimize(self):
+        '''
+        Whether hyperparameters should be optimized in the current fit (always in the first fit),
+        otherwise the model can be conditioned on new data by update()
+        '''
+        return self.n_fit % max(self.refit_interval, 1) == 0
+
+    def _reuse_hyperparameters(self, optimize):
+        '''
+        Whether the current fit starts from (or keeps) hyperparameters of the previous fit
+        '''
+        return self.n_fit > 0 and (self.warm_start or not optimize)
         
     def save(self, path):
         '''
@@ -25,6 +41,12 @@ class SurrogateModel(ABC):
         '''
         pass
 
+    def update(self, X_new, Y_new, rho_new=None):
+        '''
+        Condition the fitted surrogate model on new data (X_new, Y_new) appended to the training data, with hyperparameters held fixed
+        '''
+        raise NotImplementedError
+
     @abstractmethod
     def evaluate(self, X, std=False, calc_gradient=False, calc_hessian=False):
         '''
@@ -60,7 +60,8 @@ class BoTorchSurrogateModel(SurrogateModel):
     def __init__(self, n_var, n_obj, **kwargs):
         self.bo_model = None
         self.input_transform = None
-        super().__init__(n_var, n_obj)
+        self.X_train, self.Y_train, self.rho_train = None, None, None
+        super().__init__(n_var, n_obj, **kwargs)
         
     def save(self, path):
         self.state_dict = self.bo_model.state_dict()
@@ -83,7 +84,38 @@ class BoTorchSurrogateModel(SurrogateModel):
             print(e)
             print("failed to fit.")
 
+    def _filter_state_dict(self, state_dict):
+        '''
+        Keep only hyperparameters of a fitted model for initializing the next one,
+        data dependent transforms are excluded since they are refitted on the new data
+        '''
+        return {
+            key: value
+            for key, value in state_dict.items()
+            if "outcome_transform" not in key and "input_transform" not in key
+        }
+
+    def _warm_start_kwargs(self):
+        '''
+        Keyword arguments of initialize_model to start from the previous fitted model
+        '''
+        return {"state_dict": self._filter_state_dict(self.bo_model.state_dict())}
+
     def fit(self, X, Y, rho=None):
+        self._fit_data(X, Y, rho, optimize=self.need_optimize())
+
+    def update(self, X_new, Y_new, rho_new=None):
+        '''
+        NOTE: fantasy models of botorch (condition_on_observations) do not support heteroskedastic noise models and input perturbations,
+        so the model is rebuilt on all data from the previous hyperparameters without optimization instead
+        '''
+        X = np.vstack([self.X_train, X_new])
+        Y = np.vstack([self.Y_train, Y_new])
+        rho = np.vstack([self.rho_train, rho_new]) if rho_new is not None else None
+        self._fit_data(X, Y, rho, optimize=False)
+
+    def _fit_data(self, X, Y, rho, optimize):
+        self.X_train, self.Y_train, self.rho_train = X, Y, rho # raw training data kept for update()
         X_torch = torch.tensor(X).to(**tkwargs).detach()
         Y_torch = torch.tensor(Y).to(**tkwargs).detach()
         rho_torch = (
@@ -96,9 +128,13 @@ class BoTorchSurrogateModel(SurrogateModel):
                 f"mean: {rho_torch[:,i].mean()}, std: {rho_torch[:,i].std()}, min: {rho_torch[:,i].min()}, max: {rho_torch[:,i].max()}"
             )
 
-        mll, self.bo_model = self.initialize_model(X_torch, Y_torch, rho_torch)
+        # warm start from the previous model, or only condition on new data if hyperparameters are not optimized
+        kwargs = self._warm_start_kwargs() if self._reuse_hyperparameters(optimize) else {}
+        mll, self.bo_model = self.initialize_model(X_torch, Y_torch, rho_torch, **kwargs)
 
-        self._fit(mll)
+        if optimize:
+            self._fit(mll)
+        self.n_fit += 1
         # self._fit(mll_noise, X_torch, rho_torch, torch.zeros_like(rho_torch))
 
     def initialize_model(self, train_x, train_y, train_rho=None, state_dict=None):
@@ -122,7 +158,7 @@ class BoTorchSurrogateModel(SurrogateModel):
         model = ModelListGP(*models)
         
         if state_dict is not None:
-            model.load_state_dict(state_dict)
+            model.load_state_dict(state_dict, strict=False)
         
         mll = SumMarginalLogLikelihood(model.likelihood, model)
         
@@ -226,7 +262,7 @@ class BoTorchSurrogateModelMean(BoTorchSurrogateModel):
 
     # last objective is the "deterministic" one
 
-    def initialize_model(self, train_x, train_y, train_rho=None):
+    def initialize_model(self, train_x, train_y, train_rho=None, state_dict=None):
         # define models for objective and constraint
         train_y_mean = -train_y  # negative because botorch assumes maximization
         train_y_var = train_rho + 1e-10
@@ -271,7 +307,9 @@ class BoTorchSurrogateModelMean(BoTorchSurrogateModel):
         models.append(model_mean)
         model = ModelListGP(*models)
 
-        if self.state_dict is not None:
+        if state_dict is not None:
+            model.load_state_dict(state_dict, strict=False)
+        elif self.state_dict is not None:
             try:
                 # replace each input_transform with the one from the new model
                 for i, m in enumerate(model.models):
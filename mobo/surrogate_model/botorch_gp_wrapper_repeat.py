@@ -36,10 +36,11 @@ class BoTorchSurrogateModelReapeat(BoTorchSurrogateModel):
     """
 
     def __init__(self, n_var, n_obj, **kwargs):
-        super().__init__(n_var, n_obj)
+        super().__init__(n_var, n_obj, **kwargs)
         self.n_w = kwargs["n_w"]
         self.alpha = kwargs["alpha"]
         self.noise_model = None
+        self.parallel_fit = kwargs.get("parallel_fit", False) # batched multi-output models instead of one model per objective
         self.input_transform = InputPerturbation(
             torch.zeros((self.n_w, self.n_var), **tkwargs)
         )
@@ -49,24 +50,39 @@ class BoTorchSurrogateModelReapeat(BoTorchSurrogateModel):
         torch.save(self.state_dict, Path(path) / "state_dict.pt")
         self.state_dict_noise = self.noise_model.state_dict()
         torch.save(self.state_dict_noise, Path(path) / "state_dict_noise.pt")
+
+    def _warm_start_kwargs(self):
+        kwargs = super()._warm_start_kwargs()
+        kwargs["noise_state_dict"] = self._filter_state_dict(self.noise_model.state_dict())
+        return kwargs
         
-        
-    def initialize_model(self, train_x, train_y, train_rho=None, state_dict=None):
+    def initialize_model(self, train_x, train_y, train_rho=None, state_dict=None, noise_state_dict=None):
         # define models for objective and constraint
         train_y_mean = -train_y  # negative because botorch assumes maximization
         train_y_var = train_rho + 1e-10
 
-        models = []
-        for i in range(train_y_mean.shape[1]):
-            model = SingleTaskGP(
-                train_X=train_x,
-                train_Y=train_y_mean[..., i : i + 1],
-                # train_Yvar=train_y_var[..., i:i+1],
-                input_transform=self.input_transform,
-                outcome_transform=Standardize(m=1),
-            )
+        if self.parallel_fit:
+            # all objectives in one batched model with independent hyperparameters, fitted jointly by one optimizer run
+            models = [
+                SingleTaskGP(
+                    train_X=train_x,
+                    train_Y=train_y_mean,
+                    input_transform=self.input_transform,
+                    outcome_transform=Standardize(m=train_y_mean.shape[1]),
+                )
+            ]
+        else:
+            models = []
+            for i in range(train_y_mean.shape[1]):
+                model = SingleTaskGP(
+                    train_X=train_x,
+                    train_Y=train_y_mean[..., i : i + 1],
+                    # train_Yvar=train_y_var[..., i:i+1],
+                    input_transform=self.input_transform,
+                    outcome_transform=Standardize(m=1),
+                )
 
-            models.append(model)
+                models.append(model)
 
         model = ModelListGP(*models)
         
@@ -78,7 +94,9 @@ class BoTorchSurrogateModelReapeat(BoTorchSurrogateModel):
         
         
         if state_dict is not None:
-            model.load_state_dict(state_dict)
+            model.load_state_dict(state_dict, strict=False)
+        if noise_state_dict is not None:
+            self.noise_model.load_state_dict(noise_state_dict, strict=False)
         
         mll = SumMarginalLogLikelihood(mll_model.likelihood, mll_model)
         
@@ -88,6 +106,16 @@ class BoTorchSurrogateModelReapeat(BoTorchSurrogateModel):
         train_y_mean = train_y + 1e-6
         # train_y_var = torch.tensor(train_rho, **tkwargs) + 1e-6
 
+        if self.parallel_fit:
+            return [
+                SingleTaskGP(
+                    train_X=train_x,
+                    train_Y=train_y_mean,
+                    input_transform=self.input_transform,
+                    outcome_transform=Log(),
+                )
+            ]
+
         models = []
         for i in range(train_y_mean.shape[1]):
             model = SingleTaskGP(
@@ -220,9 +248,10 @@ class BoTorchSurrogateModelReapeatMean(BoTorchSurrogateModelReapeat):
     def __init__(self, n_var, n_obj, **kwargs):
         super().__init__(n_var, n_obj, **kwargs)
     
-    def initialize_model(self, train_x, train_y, train_rho):
+    def initialize_model(self, train_x, train_y, train_rho, state_dict=None, noise_state_dict=None):
         # define models for objective and constraint
-        mll, model_list_GP = super().initialize_model(train_x, train_y[...,:-1], train_rho[...,:-1])
+        # NOTE: states of the deterministic last objective are ignored by non-strict loading
+        mll, model_list_GP = super().initialize_model(train_x, train_y[...,:-1], train_rho[...,:-1], state_dict, noise_state_dict)
         
         class LinearMean(gpytorch.means.Mean):
             def __init__(self):        
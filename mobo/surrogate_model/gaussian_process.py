@@ -1,10 +1,11 @@
+import traceback
 import numpy as np
 from sklearn.gaussian_process import GaussianProcessRegressor
 from sklearn.gaussian_process.kernels import Matern, RBF, ConstantKernel
 from sklearn.utils.optimize import _check_optimize_result
 from scipy.optimize import minimize
-from scipy.linalg import solve_triangular
-from scipy.spatial.distance import cdist
+from scipy.linalg import solve_triangular, cholesky, cho_solve
+from multiprocessing import Process, Queue
 
 from mobo.surrogate_model.base import SurrogateModel
 from mobo.utils import safe_divide
@@ -22,6 +23,17 @@ def constrained_optimization(obj_func, initial_theta, bounds):
     return opt_res.x, opt_res.fun
 
 
+def _fit_gp(gp, X, y, idx, queue):
+    '''
+    Fit a single gp in a separate process and send it back with its objective index, or the traceback if fitting fails
+    '''
+    try:
+        gp.fit(X, y)
+        queue.put([idx, gp, None])
+    except Exception:
+        queue.put([idx, None, traceback.format_exc()])
+
+
 class GaussianProcess(SurrogateModel):
     
     def warn(*args, **kwargs):
@@ -32,10 +44,12 @@ class GaussianProcess(SurrogateModel):
     '''
     Gaussian process
     '''
-    def __init__(self, n_var, n_obj, nu, **kwargs):
-        super().__init__(n_var, n_obj)
+    def __init__(self, n_var, n_obj, nu, eval_memory_budget=None, parallel_fit=False, **kwargs):
+        super().__init__(n_var, n_obj, **kwargs)
         
         self.nu = nu
+        self.parallel_fit = parallel_fit # fit gps of all objectives in parallel processes
+        self.eval_memory_budget = eval_memory_budget # memory budget (MB) of evaluation, None means unlimited
         self.gps = []
 
         for _ in range(n_obj):
@@ -51,127 +65,285 @@ class GaussianProcess(SurrogateModel):
             gp = GaussianProcessRegressor(kernel=kernel, optimizer=constrained_optimization)
             self.gps.append(gp)
 
-    def fit(self, X, Y, rho=None):
+        self.init_kernels = [gp.kernel for gp in self.gps] # initial kernels of hyperparameter optimization without warm start
+        self.cache = None # precomputations of fitted gps stacked over objectives, rebuilt after each fit
+
+    def _set_fit_policy(self, optimize):
+        '''
+        Set initial kernels and optimizers of gps for the current fit according to warm start and refit interval
+        '''
+        reuse = self._reuse_hyperparameters(optimize)
+        optimizer = constrained_optimization if optimize else None # None only conditions on new data
+        for gp, init_kernel in zip(self.gps, self.init_kernels):
+            gp.kernel = gp.kernel_ if reuse else init_kernel
+            gp.optimizer = optimizer
+
+    def _fit_gps(self, X, Y):
+        '''
+        Fit gps of all objectives, each in a separate process if parallel_fit is enabled
+        '''
+        self._set_fit_policy(self.need_optimize())
+        if not self.parallel_fit or self.n_obj == 1:
+            for i, gp in enumerate(self.gps):
+                gp.fit(X, Y[:, i])
+            return
+
+        queue = Queue()
+        processes = [Process(target=_fit_gp, args=(gp, X, Y[:, i], i, queue)) for i, gp in enumerate(self.gps)]
+        for p in processes:
+            p.start()
+        # NOTE: fitted gps are copies sent back from subprocesses, so they replace the original ones
+        errors = []
+        for _ in range(self.n_obj):
+            i, gp, error = queue.get()
+            if error is None:
+                self.gps[i] = gp
+            else:
+                errors.append(error)
+        for p in processes:
+            p.join()
+        if len(errors) > 0:
+            raise RuntimeError(f'gp fitting failed in subprocess:\n{errors[0]}')
+
+    def _update_gps(self, X_new, Y_new):
+        '''
+        Condition fitted gps on new data with fixed kernel hyperparameters, by extending the cholesky factor of the training kernel matrix:
+            L = [[L_11, 0], [S^T, L_22]], where S = L_11^-1 K_12, L_22 = cholesky(K_22 - S^T S)
+        which costs O(N_train^2 * N_new) instead of O(N_train^3) of refactorization
+        '''
         for i, gp in enumerate(self.gps):
-            gp.fit(X, Y[:, i])
+            X_train, y_train = gp.X_train_, np.concatenate([gp.y_train_, Y_new[:, i]])
+            K_12 = gp.kernel_(X_train, X_new)
+            K_22 = gp.kernel_(X_new)
+            K_22[np.diag_indices_from(K_22)] += gp.alpha
+            S = solve_triangular(gp.L_, K_12, lower=True)
+            try:
+                L_22 = cholesky(K_22 - S.T @ S, lower=True)
+            except np.linalg.LinAlgError: # numerically not positive definite, refactorize from scratch
+                gp.kernel, gp.optimizer = gp.kernel_, None
+                gp.fit(np.vstack([X_train, X_new]), y_train)
+                continue
+
+            N_train, N_new = len(X_train), len(X_new)
+            L = np.zeros((N_train + N_new, N_train + N_new))
+            L[:N_train, :N_train] = gp.L_
+            L[N_train:, :N_train] = S.T
+            L[N_train:, N_train:] = L_22
+
+            gp.X_train_ = np.vstack([X_train, X_new])
+            gp.y_train_ = y_train
+            gp.L_ = L
+            gp.alpha_ = cho_solve((L, True), y_train)
+
+    def fit(self, X, Y, rho=None):
+        self._fit_gps(X, Y)
+        self._build_cache()
+        self.n_fit += 1
+
+    def update(self, X_new, Y_new, rho_new=None):
+        self._update_gps(X_new, Y_new)
+        self._build_cache()
+        self.n_fit += 1
+
+    def _build_cache(self):
+        '''
+        Precompute quantities of fitted gps that are reused by every evaluation, stacked over objectives
+        NOTE: all gps share the same training inputs
+        '''
+        thetas = np.array([gp.kernel_.theta for gp in self.gps]) # thetas: shape (n_obj, n_var + 2)
+        self.cache = {
+            'X_train': self.gps[0].X_train_, # shape (N_train, n_var)
+            'L': [gp.L_ for gp in self.gps], # lower cholesky factors of training kernel matrices, shape (N_train, N_train) each
+            'alpha': np.array([gp.alpha_ for gp in self.gps]), # shape (n_obj, N_train)
+            'ell': np.exp(thetas[:, 1:-1]), # shape (n_obj, n_var)
+            'sf2': np.exp(thetas[:, 0]), # shape (n_obj,)
+            'c': np.exp(thetas[:, -1]), # constant kernel, shape (n_obj,)
+        }
+
+    def _kernel(self, d):
+        '''
+        Kernel value from scaled distance d: shape (n_obj, N, N_train), stacked over objectives
+        '''
+        sf2, c = self.cache['sf2'][:, None, None], self.cache['c'][:, None, None]
+        if self.nu == 1:
+            k = np.exp(-d)
+        elif self.nu == 3:
+            k = (1 + np.sqrt(3) * d) * np.exp(-np.sqrt(3) * d)
+        elif self.nu == 5:
+            k = (1 + np.sqrt(5) * d + 5. / 3 * d ** 2) * np.exp(-np.sqrt(5) * d)
+        elif self.nu <= 0: # RBF
+            k = np.exp(-0.5 * d ** 2)
+        else: # general matern kernel from sklearn
+            return None
+        return sf2 * k + c
         
+    def _get_chunk_size(self, std, calc_gradient, calc_hessian):
+        '''
+        Maximum number of query samples evaluated at once within the memory budget
+        '''
+        if self.eval_memory_budget is None:
+            return np.inf
+        N_train = len(self.cache['X_train'])
+        # rough number of float64 values held by the largest intermediate arrays per query sample
+        n_value = N_train * (self.n_var + 4 * self.n_obj)
+        if calc_gradient or calc_hessian:
+            n_value += 4 * self.n_obj * N_train * self.n_var
+        if calc_hessian:
+            n_value += 5 * self.n_obj * N_train * self.n_var ** 2
+        return max(1, int(self.eval_memory_budget * 1024 ** 2 / (8 * n_value)))
+
     def evaluate(self, X, rho=None, std=False, calc_gradient=False, calc_hessian=False, **kwargs):
-        F, dF, hF = [], [], [] # mean
-        S, dS, hS = [], [], [] # std
+        '''
+        Evaluate in chunks if the query batch is too large for the memory budget, results are streamed into preallocated arrays
+        '''
+        chunk_size = self._get_chunk_size(std, calc_gradient, calc_hessian)
+        if len(X) <= chunk_size:
+            return self._evaluate(X, std, calc_gradient, calc_hessian)
+
+        out = None
+        for start in range(0, len(X), chunk_size):
+            val = self._evaluate(X[start:start + chunk_size], std, calc_gradient, calc_hessian)
+            if out is None:
+                out = {key: None if v is None else np.empty((len(X),) + v.shape[1:]) for key, v in val.items()}
+            for key, v in val.items():
+                if v is not None:
+                    out[key][start:start + chunk_size] = v
+
+        if out['dS'] is not None:
+            # keep the behavior of evaluating all at once, gradient of std is zero for objectives where any std is zero
+            out['dS'][:, np.min(out['S'], axis=0) == 0] = 0.0
+        return out
 
-        for gp in self.gps:
+    def _evaluate(self, X, std=False, calc_gradient=False, calc_hessian=False):
+        cache = self.cache
+        ell, sf2 = cache['ell'], cache['sf2'][:, None, None, None] # ell: shape (n_obj, n_var), sf2: shape (n_obj, 1, 1, 1)
+        X_, X_train_ = np.expand_dims(X, 1), np.expand_dims(cache['X_train'], 0)
 
-            # mean
-            K = gp.kernel_(X, gp.X_train_) # K: shape (N, N_train)
-            y_mean = K.dot(gp.alpha_)
-            
-            F.append(y_mean) # y_mean: shape (N,)
+        # pairwise differences are shared by all objectives, only lengthscales differ
+        diff = X_ - X_train_ # diff: shape (N, N_train, n_var)
+        d = np.sqrt(np.einsum('ijk,ok->oij', diff ** 2, 1. / ell ** 2)) # d: shape (n_obj, N, N_train)
 
-            if std:
-                
-                L_inv = solve_triangular(gp.L_.T,
-                                                np.eye(gp.L_.shape[0]))
-                K_inv = L_inv.dot(L_inv.T)
-
-                y_var = gp.kernel_.diag(X)
-                y_var -= np.einsum("ij,ij->i",
-                                    np.dot(K, K_inv), K)
+        # mean
+        K = self._kernel(d) # K: shape (n_obj, N, N_train)
+        if K is None:
+            K = np.array([gp.kernel_(X, gp.X_train_) for gp in self.gps])
+        F = np.einsum('oij,oj->io', K, cache['alpha']) # F: shape (N, n_obj)
+        dF = hF = S = dS = hS = None
 
-                y_var_negative = y_var < 0
-                if np.any(y_var_negative):
-                    y_var[y_var_negative] = 0.0
+        if std:
+            # NOTE: K_inv is never formed, K_inv = L^-T L^-1 is applied by triangular solves instead
+            V = np.array([solve_triangular(L, K_o.T, lower=True) for L, K_o in zip(cache['L'], K)]) # V = L^-1 K^T: shape (n_obj, N_train, N)
 
-                y_std = np.sqrt(y_var)
+            y_var = np.array([gp.kernel_.diag(X) for gp in self.gps]) # y_var: shape (n_obj, N)
+            y_var -= np.einsum("oij,oij->oj", V, V)
 
-                S.append(y_std) # y_std: shape (N,)
+            y_var_negative = y_var < 0
+            if np.any(y_var_negative):
+                y_var[y_var_negative] = 0.0
 
-            if not (calc_gradient or calc_hessian): continue
+            y_std = np.sqrt(y_var)
 
-            ell = np.exp(gp.kernel_.theta[1:-1]) # ell: shape (n_var,)
-            sf2 = np.exp(gp.kernel_.theta[0]) # sf2: shape (1,)
-            d = np.expand_dims(cdist(X / ell, gp.X_train_ / ell), 2) # d: shape (N, N_train, 1)
-            X_, X_train_ = np.expand_dims(X, 1), np.expand_dims(gp.X_train_, 0)
-            dd_N = X_ - X_train_ # numerator
-            dd_D = d * ell ** 2 # denominator
-            dd = safe_divide(dd_N, dd_D) # dd: shape (N, N_train, n_var)
+            S = y_std.T # S: shape (N, n_obj)
 
             if calc_gradient or calc_hessian:
-                if self.nu == 1:
-                    dK = -sf2 * np.exp(-d) * dd
-
-                elif self.nu == 3:
-                    dK = -3 * sf2 * np.exp(-np.sqrt(3) * d) * d * dd
-
-                elif self.nu == 5:
-                    dK = -5. / 3 * sf2 * np.exp(-np.sqrt(5) * d) * (1 + np.sqrt(5) * d) * d * dd
-
-                else: # RBF
-                    dK = -sf2 * np.exp(-0.5 * d ** 2) * d * dd
-
-                dK_T = dK.transpose(0, 2, 1) # dK: shape (N, N_train, n_var), dK_T: shape (N, n_var, N_train)
-                
-            if calc_gradient:
-                dy_mean = dK_T @ gp.alpha_ # gp.alpha_: shape (N_train,)
-                dF.append(dy_mean) # dy_mean: shape (N, n_var)
-
-                # TODO: check
-                if std:
-                    K = np.expand_dims(K, 1) # K: shape (N, 1, N_train)
-                    K_Ki = K @ K_inv # gp._K_inv: shape (N_train, N_train), K_Ki: shape (N, 1, N_train)
-                    dK_Ki = dK_T @ K_inv # dK_Ki: shape (N, n_var, N_train)
-
-                    dy_var = -np.sum(dK_Ki * K + K_Ki * dK_T, axis=2) # dy_var: shape (N, n_var)
-                    #print(dy_var.shape)
-                    #print(np.expand_dims(y_std,1).shape)
-                    #dy_std = 0.5 * safe_divide(dy_var, y_std) # dy_std: shape (N, n_var)
-                    if np.min(y_std) != 0:
-                        dy_std = 0.5 * dy_var / np.expand_dims(y_std,1) # dy_std: shape (N, n_var)
-                    else:
-                        dy_std=np.zeros(dy_var.shape)
-                    dS.append(dy_std)
-
-            if calc_hessian:
-                d = np.expand_dims(d, 3) # d: shape (N, N_train, 1, 1)
-                dd = np.expand_dims(dd, 2) # dd: shape (N, N_train, 1, n_var)
-                hd_N = d * np.expand_dims(np.eye(len(ell)), (0, 1)) - np.expand_dims(X_ - X_train_, 3) * dd # numerator
-                hd_D = d ** 2 * np.expand_dims(ell ** 2, (0, 1, 3)) # denominator
-                hd = safe_divide(hd_N, hd_D) # hd: shape (N, N_train, n_var, n_var)
-
-                if self.nu == 1:
-                    hK = -sf2 * np.exp(-d) * (hd - dd ** 2)
-
-                elif self.nu == 3:
-                    hK = -3 * sf2 * np.exp(-np.sqrt(3) * d) * (d * hd + (1 - np.sqrt(3) * d) * dd ** 2)
-
-                elif self.nu == 5:
-                    hK = -5. / 3 * sf2 * np.exp(-np.sqrt(5) * d) * (-5 * d ** 2 * dd ** 2 + (1 + np.sqrt(5) * d) * (dd ** 2 + d * hd))
-
-                else: # RBF
-                    hK = -sf2 * np.exp(-0.5 * d ** 2) * ((1 - d ** 2) * dd ** 2 + d * hd)
-
-                hK_T = hK.transpose(0, 2, 3, 1) # hK: shape (N, N_train, n_var, n_var), hK_T: shape (N, n_var, n_var, N_train)
-
-                hy_mean = hK_T @ gp.alpha_ # hy_mean: shape (N, n_var, n_var)
-                hF.append(hy_mean)
-
-                # TODO: check
-                if std:
-                    K = np.expand_dims(K, 2) # K: shape (N, 1, 1, N_train)
-                    dK = np.expand_dims(dK_T, 2) # dK: shape (N, n_var, 1, N_train)
-                    dK_Ki = np.expand_dims(dK_Ki, 2) # dK_Ki: shape (N, n_var, 1, N_train)
-                    hK_Ki = hK_T @ K_inv # hK_Ki: shape (N, n_var, n_var, N_train)
-
-                    hy_var = -np.sum(hK_Ki * K + 2 * dK_Ki * dK + K_Ki * hK_T, axis=3) # hy_var: shape (N, n_var, n_var)
-                    hy_std = 0.5 * safe_divide(hy_var * y_std - dy_var * dy_std, y_var) # hy_std: shape (N, n_var, n_var)
-                    hS.append(hy_std)
-
-        F = np.stack(F, axis=1)
-        dF = np.stack(dF, axis=1) if calc_gradient else None
-        hF = np.stack(hF, axis=1) if calc_hessian else None
-        
-        S = np.stack(S, axis=1) if std else None
-        dS = np.stack(dS, axis=1) if std and calc_gradient else None
-        hS = np.stack(hS, axis=1) if std and calc_hessian else None
+                K_Ki = np.array([solve_triangular(L.T, V_o, lower=False).T for L, V_o in zip(cache['L'], V)]) # K_Ki = K K_inv: shape (n_obj, N, N_train)
+
+        if not (calc_gradient or calc_hessian):
+            return {'F': F, 'dF': dF, 'hF': hF, 'S': S, 'dS': dS, 'hS': hS}
+
+        d = np.expand_dims(d, 3) # d: shape (n_obj, N, N_train, 1)
+        ell = ell[:, None, None, :] # ell: shape (n_obj, 1, 1, n_var)
+        dd_N = np.expand_dims(diff, 0) # numerator
+        dd_D = d * ell ** 2 # denominator
+        dd = safe_divide(dd_N, dd_D) # dd: shape (n_obj, N, N_train, n_var)
+
+        if self.nu == 1:
+            dK = -sf2 * np.exp(-d) * dd
+
+        elif self.nu == 3:
+            dK = -3 * sf2 * np.exp(-np.sqrt(3) * d) * d * dd
+
+        elif self.nu == 5:
+            dK = -5. / 3 * sf2 * np.exp(-np.sqrt(5) * d) * (1 + np.sqrt(5) * d) * d * dd
+
+        else: # RBF
+            dK = -sf2 * np.exp(-0.5 * d ** 2) * d * dd
+
+        if calc_gradient:
+            dF = np.einsum('oijk,oj->iok', dK, cache['alpha']) # dF: shape (N, n_obj, n_var)
+
+            # TODO: check
+            if std:
+                # K_inv is symmetric, so d(K K_inv K^T) = 2 dK K_inv K^T
+                dy_var = -2 * np.einsum('oijk,oij->oik', dK, K_Ki) # dy_var: shape (n_obj, N, n_var)
+                # NOTE: gradient of std is set to zero for objectives where any std is zero
+                y_std_nonzero = np.min(y_std, axis=1) != 0
+                dy_std = np.zeros(dy_var.shape)
+                dy_std[y_std_nonzero] = 0.5 * dy_var[y_std_nonzero] / np.expand_dims(y_std[y_std_nonzero], 2) # dy_std: shape (n_obj, N, n_var)
+                dS = dy_std.transpose(1, 0, 2) # dS: shape (N, n_obj, n_var)
+
+        if calc_hessian:
+            d = np.expand_dims(d, 4) # d: shape (n_obj, N, N_train, 1, 1)
+            dd = np.expand_dims(dd, 3) # dd: shape (n_obj, N, N_train, 1, n_var)
+            # hd = (d * I - (X_ - X_train_) dd) / (d ** 2 * ell ** 2) = (I / ell ** 2 - dd^T dd) / d
+            hd = safe_divide(1., d) * (np.eye(X.shape[1]) / np.expand_dims(ell ** 2, 4) - dd.swapaxes(3, 4) * dd) # hd: shape (n_obj, N, N_train, n_var, n_var)
+            sf2 = np.expand_dims(sf2, 4)
+
+            # hK = c_dd * dd^T dd + c_hd * hd, coefficients are computed before broadcasting to full shape
+            if self.nu == 1:
+                c_dd = sf2 * np.exp(-d)
+                c_hd = -c_dd
+
+            elif self.nu == 3:
+                c = -3 * sf2 * np.exp(-np.sqrt(3) * d)
+                c_dd, c_hd = c * (1 - np.sqrt(3) * d), c * d
+
+            elif self.nu == 5:
+                c = -5. / 3 * sf2 * np.exp(-np.sqrt(5) * d)
+                c_dd, c_hd = c * (1 + np.sqrt(5) * d - 5 * d ** 2), c * (1 + np.sqrt(5) * d) * d
+
+            else: # RBF
+                c = -sf2 * np.exp(-0.5 * d ** 2)
+                c_dd, c_hd = c * (1 - d ** 2), c * d
+
+            hK = c_dd * dd.swapaxes(3, 4) * dd + c_hd * hd
+
+            hF = np.einsum('oijkl,oj->iokl', hK, cache['alpha']) # hF: shape (N, n_obj, n_var, n_var)
+
+            if std:
+                # dK K_inv dK^T = (L^-1 dK^T)^T (L^-1 dK^T)
+                N, N_train, n_var = dK.shape[1:]
+                dV = np.array([solve_triangular(L, dK_o.transpose(1, 0, 2).reshape(N_train, -1), lower=True) for L, dK_o in zip(cache['L'], dK)]) # dV: shape (n_obj, N_train, N * n_var)
+                dV = dV.reshape(-1, N_train, N, n_var)
+                hy_var = -2 * np.einsum('oijkl,oij->oikl', hK, K_Ki) - 2 * np.einsum('ojik,ojil->oikl', dV, dV) # hy_var: shape (n_obj, N, n_var, n_var)
+                y_std, y_var = y_std[..., None, None], y_var[..., None, None]
+                # hessian of sqrt(var): (hvar * std - dvar^T dstd) / (2 * var)
+                hy_std = 0.5 * safe_divide(hy_var * y_std - np.expand_dims(dy_var, 3) * np.expand_dims(dy_std, 2), y_var) # hy_std: shape (n_obj, N, n_var, n_var)
+                hS = hy_std.transpose(1, 0, 2, 3) # hS: shape (N, n_obj, n_var, n_var)
 
         out = {'F': F, 'dF': dF, 'hF': hF, 'S': S, 'dS': dS, 'hS': hS}
         return out
+
+
+if __name__ == '__main__':
+    # check derivatives of mean and std against central finite differences, run by: python -m mobo.surrogate_model.gaussian_process
+    np.random.seed(0)
+    n_var, n_obj, N, h = 3, 2, 5, 1e-5
+    X_train, Y_train = np.random.rand(20, n_var), np.random.rand(20, n_obj)
+    X = np.random.rand(N, n_var)
+    I = np.eye(n_var)
+
+    for nu in [1, 3, 5, -1]:
+        model = GaussianProcess(n_var, n_obj, nu=nu)
+        model.fit(X_train, Y_train)
+        out = model.evaluate(X, std=True, calc_gradient=True, calc_hessian=True)
+        # first derivatives from values, second derivatives from analytical first derivatives, shape (N, n_obj, n_var(, n_var))
+        vals_p = [model.evaluate(X + h * I[j], std=True, calc_gradient=True) for j in range(n_var)]
+        vals_m = [model.evaluate(X - h * I[j], std=True, calc_gradient=True) for j in range(n_var)]
+        for name, d_name, h_name in [('F', 'dF', 'hF'), ('S', 'dS', 'hS')]:
+            d_fd = np.stack([(p[name] - m[name]) / (2 * h) for p, m in zip(vals_p, vals_m)], axis=-1)
+            h_fd = np.stack([(p[d_name] - m[d_name]) / (2 * h) for p, m in zip(vals_p, vals_m)], axis=-1)
+            d_err = np.max(np.abs(out[d_name] - d_fd)) / max(np.max(np.abs(d_fd)), 1e-12)
+            h_err = np.max(np.abs(out[h_name] - h_fd)) / max(np.max(np.abs(h_fd)), 1e-12)
+            print(f'nu={nu}: max relative error of {d_name} {d_err:.2e}, {h_name} {h_err:.2e}')
+            assert d_err < 1e-4 and h_err < 1e-4
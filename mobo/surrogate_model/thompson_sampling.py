@@ -12,19 +12,33 @@ class ThompsonSampling(GaussianProcess):
     Sampled functions from Gaussian process using Thompson Sampling
     '''
     def __init__(self, n_var, n_obj, nu, n_spectral_pts, mean_sample, **kwargs):
-        super().__init__(n_var, n_obj, nu)
+        super().__init__(n_var, n_obj, nu, **kwargs)
 
         self.M = n_spectral_pts
         self.thetas, self.Ws, self.bs, self.sf2s = None, None, None, None
         self.mean_sample = mean_sample
 
     def fit(self, X, Y, rho=None):
+        # fit all gps first (possibly in parallel), spectral sampling is done sequentially to keep the random sequence
+        self._fit_gps(X, Y)
+        self._sample_functions(X, Y)
+        self.n_fit += 1
+
+    def update(self, X_new, Y_new, rho_new=None):
+        # sampled functions depend on all data, so they are redrawn from the incrementally conditioned gps
+        self._update_gps(X_new, Y_new)
+        X, Y = self.gps[0].X_train_, np.column_stack([gp.y_train_ for gp in self.gps])
+        self._sample_functions(X, Y)
+        self.n_fit += 1
+
+    def _sample_functions(self, X, Y):
+        '''
+        Sample objective functions by spectral sampling from fitted gps
+        '''
         self.thetas, self.Ws, self.bs, self.sf2s = [], [], [], []
         n_sample = X.shape[0]
 
         for i, gp in enumerate(self.gps):
-            gp.fit(X, Y[:, i])
-
             ell = np.exp(gp.kernel_.theta[1:-1])
             sf2 = np.exp(2 * gp.kernel_.theta[0])
             sn2 = np.exp(2 * gp.kernel_.theta[-1])
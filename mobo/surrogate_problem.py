@@ -34,7 +34,7 @@ class SurrogateProblem(Problem):
     def _evaluate(self, x, out, *args, calc_gradient=False, calc_hessian=False, **kwargs):
         # evaluate value by surrogate model
         std = self.acquisition.requires_std
-        val = self.surrogate_model.evaluate(x, std, calc_gradient, calc_hessian)
+        val = self.surrogate_model.evaluate(x, std=std, calc_gradient=calc_gradient, calc_hessian=calc_hessian)
 
         # evaluate out['F/dF/hF'] by certain acquisition function
         out['F'], out['dF'], out['hF'] = self.acquisition.evaluate(val, calc_gradient, calc_hessian)
@@ -73,7 +73,7 @@ class RiskySurrogateProblem(RiskyProblem):
     def _evaluate(self, x, out, *args, calc_gradient=False, calc_hessian=False, **kwargs):
         # evaluate value by surrogate model
         std = self.acquisition.requires_std
-        val = self.surrogate_model.evaluate(x, std, calc_gradient, calc_hessian)
+        val = self.surrogate_model.evaluate(x, std=std, calc_gradient=calc_gradient, calc_hessian=calc_hessian)
 
         # evaluate out['F/dF/hF'] by certain acquisition function
         out['F'], out['dF'], out['hF'] = self.acquisition.evaluate(val, calc_gradient, calc_hessian)
@@ -1,6 +1,7 @@
 from time import time
 import numpy as np
-from pymoo.factory import get_performance_indicator
+from .nondominated import find_nondominated_indices
+from .hypervolume import hypervolume
 
 class Timer:
     '''
@@ -45,12 +46,7 @@ def find_pareto_front(Y, return_index=False):
     Find pareto front (undominated part) of the input performance data.
     '''
     if len(Y) == 0: return np.array([])
-    sorted_indices = np.argsort(Y.T[0])
-    pareto_indices = []
-    for idx in sorted_indices:
-        # check domination relationship
-        if not (np.logical_and((Y <= Y[idx]).all(axis=1), (Y < Y[idx]).any(axis=1))).any():
-            pareto_indices.append(idx)
+    pareto_indices = find_nondominated_indices(Y)
     pareto_front = Y[pareto_indices].copy()
 
     if return_index:
@@ -59,12 +55,66 @@ def find_pareto_front(Y, return_index=False):
         return pareto_front
 
 
+def _is_dominated(Y, Y_ref):
+    '''
+    Check whether each row of Y is dominated by any row of Y_ref
+    '''
+    if len(Y) == 0 or len(Y_ref) == 0:
+        return np.zeros(len(Y), dtype=bool)
+    Y, Y_ref = expand(Y, 1), expand(Y_ref, 0)
+    return np.logical_and((Y_ref <= Y).all(axis=2), (Y_ref < Y).any(axis=2)).any(axis=1)
+
+
+class ParetoArchive:
+    '''
+    Incrementally maintained pareto front (undominated part) of a growing set of performance data.
+    New data only need to be compared against the current front instead of the whole history,
+    the result is the same as calling find_pareto_front on all the data seen so far.
+    '''
+    def __init__(self):
+        self.front = None # performance of current pareto front
+        self.indices = np.zeros(0, dtype=int) # indices of current pareto front in all data seen so far
+        self.n_sample = 0
+
+    def update(self, Y):
+        '''
+        Insert a new batch of performance data into the archive
+        Input:
+            Y: new performance data, shape (n_sample, n_obj)
+        Output:
+            front: updated pareto front, sorted by the first objective
+            indices: indices of the front in all data seen so far
+        '''
+        Y = np.atleast_2d(Y)
+        new_indices = np.arange(self.n_sample, self.n_sample + len(Y))
+        self.n_sample += len(Y)
+        if len(Y) == 0:
+            return self.front, self.indices
+
+        # only the undominated part of the new batch can enter the front
+        Y_new, new_pidx = find_pareto_front(Y, return_index=True)
+        new_indices = new_indices[new_pidx]
+
+        if self.front is None:
+            front, indices = Y_new, new_indices
+        else:
+            # NOTE: domination is transitive, so if a new sample is dominated by any old sample, it is also dominated by the old front
+            new_mask = ~_is_dominated(Y_new, self.front)
+            Y_new, new_indices = Y_new[new_mask], new_indices[new_mask]
+            old_mask = ~_is_dominated(self.front, Y_new)
+            front = np.vstack([self.front[old_mask], Y_new])
+            indices = np.concatenate([self.indices[old_mask], new_indices])
+
+        sorted_order = np.argsort(front[:, 0], kind='stable')
+        self.front, self.indices = front[sorted_order], indices[sorted_order]
+        return self.front.copy(), self.indices.copy()
+
+
 def calc_hypervolume(pfront, ref_point):
     '''
     Calculate hypervolume of pfront based on ref_point
     '''
-    hv = get_performance_indicator('hv', ref_point=ref_point)
-    return hv.calc(pfront)
+    return hypervolume(pfront, ref_point)
 
 
 def safe_divide(x1, x2):
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import hashlib
+from contextlib import contextmanager
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from problems.cache import get_problem_signature
+
+"""
+Versioned store of precomputed artifacts (true Pareto fronts, reference points) by problem configuration.
+Each artifact is a npz file named by kind and a hash of its configuration, computed once and loaded afterwards.
+"""
+
+# NOTE: increase when problem definitions or computations of artifacts change, to invalidate stored artifacts
+ARTIFACT_VERSION = 2
+ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'artifacts')
+
+# seed of the isolated random state for computing true Pareto fronts
+PARETO_FRONT_SEED = 0
+
+
+@contextmanager
+def isolated_random_state(seed):
+    '''
+    Seed numpy and torch for the computation inside, restore the random states of the caller afterwards,
+    so that results do not depend on whether artifacts are computed or loaded
+    '''
+    np_state, torch_state = np.random.get_state(), torch.get_rng_state()
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    try:
+        yield
+    finally:
+        np.random.set_state(np_state)
+        torch.set_rng_state(torch_state)
+
+
+def get_artifact_path(kind, config, root=ARTIFACT_DIR):
+    '''
+    Path of the artifact of kind with configuration (dict)
+    '''
+    config = dict(config, version=ARTIFACT_VERSION)
+    key = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return os.path.join(root, f'{kind}_{key}_v{ARTIFACT_VERSION}.npz')
+
+
+def load_artifact(kind, config, root=ARTIFACT_DIR):
+    '''
+    Load an artifact as a dict of arrays, None if not stored yet
+    '''
+    path = get_artifact_path(kind, config, root)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files if name != 'config'}
+
+
+def save_artifact(kind, config, arrays, root=ARTIFACT_DIR):
+    '''
+    Save a dict of arrays as an artifact, written atomically since experiments may run concurrently
+    '''
+    path = get_artifact_path(kind, config, root)
+    os.makedirs(root, exist_ok=True)
+    tmp_path = f'{path[:-4]}.{os.getpid()}.tmp.npz'
+    config = json.dumps(dict(config, version=ARTIFACT_VERSION), sort_keys=True, default=str)
+    np.savez(tmp_path, config=config, **{name: np.asarray(array) for name, array in arrays.items()})
+    os.replace(tmp_path, path)
+
+
+def load_or_compute_pareto_front(problem, root=ARTIFACT_DIR):
+    '''
+    True Pareto front of the problem (an array, or a list of arrays for noisy problems), computed once per configuration,
+    None if the problem has no true Pareto front
+    '''
+    config = {'problem': get_problem_signature(problem)}
+    arrays = load_artifact('pareto_front', config, root)
+    if arrays is not None:
+        if 'no_pareto_front' in arrays:
+            return None
+        if 'pareto_front' in arrays:
+            return arrays['pareto_front']
+        return [arrays[f'pareto_front_{i}'] for i in range(len(arrays))]
+
+    with isolated_random_state(PARETO_FRONT_SEED):
+        pareto_front = problem.pareto_front()
+    # NOTE: a missing front is stored as an empty marker, None would be saved as an object array that cannot be loaded
+    if pareto_front is None:
+        arrays = {'no_pareto_front': np.zeros(0)}
+    elif isinstance(pareto_front, (list, tuple)):
+        arrays = {f'pareto_front_{i}': front for i, front in enumerate(pareto_front)}
+    else:
+        arrays = {'pareto_front': pareto_front}
+    save_artifact('pareto_front', config, arrays, root)
+    return pareto_front
+
+
+def load_or_compute_ref_point(problem, n_var, n_obj, n_init_sample, seed, compute_func, root=ARTIFACT_DIR):
+    '''
+    Reference points (pymoo, botorch) of the problem from initial samples, computed by compute_func once per configuration
+    '''
+    config = {'problem': problem, 'n_var': n_var, 'n_obj': n_obj, 'n_init_sample': n_init_sample, 'seed': seed}
+    arrays = load_artifact('ref_point', config, root)
+    if arrays is not None:
+        return arrays['ref_point_pymoo'].tolist(), arrays['ref_point_botorch'].tolist()
+
+    with isolated_random_state(seed):
+        ref_point_pymoo, ref_point_botorch = compute_func()
+    save_artifact('ref_point', config, {'ref_point_pymoo': ref_point_pymoo, 'ref_point_botorch': ref_point_botorch}, root)
+    return ref_point_pymoo, ref_point_botorch
+
+
+if __name__ == '__main__':
+    # precompute true Pareto fronts and reference points of all problems
+    from argparse import ArgumentParser
+    from problems.common import get_problem_options
+    from ref_point import RefPoint
+
+    parser = ArgumentParser()
+    parser.add_argument('--problem', type=str, nargs='+', default=None,
+        help='problems to precompute, all problems of get_problem_options() by default')
+    parser.add_argument('--n-var', type=int, default=2)
+    parser.add_argument('--n-obj', type=int, default=2)
+    parser.add_argument('--n-init-sample', type=int, nargs='+', default=[6],
+        help='numbers of initial samples of reference points')
+    parser.add_argument('--seed', type=int, nargs='+', default=[0],
+        help='seeds of reference points')
+    args = parser.parse_args()
+
+    problems = args.problem if args.problem is not None else list(get_problem_options().keys())
+    for name in problems:
+        for n_init_sample in args.n_init_sample:
+            for seed in args.seed:
+                # NOTE: reference points build the problem, which stores its true Pareto front as well
+                try:
+                    RefPoint(name, args.n_var, args.n_obj, n_init_sample, seed=seed)
+                    print(f'{name} (n_init_sample={n_init_sample}, seed={seed}) done')
+                except Exception as e:
+                    print(f'{name} (n_init_sample={n_init_sample}, seed={seed}) failed: {e}')
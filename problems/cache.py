@@ -0,0 +1,215 @@
+import os
+import pickle
+import sqlite3
+import hashlib
+import numpy as np
+from pymoo.model.problem import Problem as PymooProblem
+
+"""
+Persistent on-disk cache of real problem evaluations, backed by SQLite.
+Entries are content-addressed by the problem (class and constructor parameters), the requested values, extra arguments of evaluate and the evaluated X,
+so repeated and overlapping evaluations across runs and seeds are served from disk.
+"""
+
+# maximum number of keys in a single SQL query, below the default SQLite variable limit
+QUERY_CHUNK_SIZE = 500
+
+
+def _hash(*items):
+    '''
+    Hash a sequence of strings, bytes and numpy arrays into a hex key
+    '''
+    h = hashlib.sha256()
+    for item in items:
+        if isinstance(item, np.ndarray):
+            item = np.ascontiguousarray(item)
+            h.update(str((item.dtype.str, item.shape)).encode())
+            item = item.tobytes()
+        elif isinstance(item, str):
+            item = item.encode()
+        h.update(item)
+        h.update(b'|')
+    return h.hexdigest()
+
+
+def _get_signature_value(value, problem=None):
+    '''
+    Hashable representation of a configuration value, raises TypeError if the value cannot be represented
+    '''
+    if isinstance(value, (bool, int, float, str, type(None))):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray) and not value.dtype.hasobject:
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_get_signature_value(v, problem) for v in value]
+    if isinstance(value, dict):
+        return sorted((str(k), _get_signature_value(v, problem)) for k, v in value.items())
+    if isinstance(value, type):
+        return f'{value.__module__}.{value.__qualname__}'
+    if isinstance(value, PymooProblem):
+        return get_problem_signature(value)
+    if type(value).__module__.startswith('pandas') and hasattr(value, 'to_numpy'): # e.g. data of experiment problems
+        import pandas as pd
+        return _hash(str(list(getattr(value, 'columns', []))), pd.util.hash_pandas_object(value).to_numpy())
+    raise TypeError(f'{type(value).__name__} cannot be part of the evaluation cache key')
+
+
+def _is_derived_method(value, problem):
+    '''
+    Whether value is a bound method of the problem itself (or np.vectorize of one), which is defined by the class
+    '''
+    if isinstance(value, np.vectorize):
+        value = value.pyfunc
+    return getattr(value, '__self__', None) is problem
+
+
+def get_problem_signature(problem):
+    '''
+    Signature of a problem from its class and constructor parameters (public attributes, including nested ones).
+    Raises TypeError if an attribute cannot be represented, so that differently configured problems never share cache entries.
+    '''
+    params = []
+    for name, value in sorted(vars(problem).items()):
+        if name.startswith('_') or name in ['eval_cache', 'parallelization', 'callback'] or _is_derived_method(value, problem):
+            continue
+        try:
+            params.append((name, _get_signature_value(value, problem)))
+        except TypeError as e:
+            raise TypeError(f'cannot cache evaluations of {type(problem).__name__}, attribute {name}: {e}') from None
+    return f'{type(problem).__module__}.{type(problem).__name__}{params}'
+
+
+def get_arguments_signature(args, kwargs):
+    '''
+    Signature of extra positional and keyword arguments of evaluate, raises TypeError if an argument cannot be represented
+    '''
+    return str(_get_signature_value([list(args), dict(kwargs)]))
+
+
+def get_rng_state_hash():
+    '''
+    Hash of the global numpy random state, which determines the noise of noisy problems
+    '''
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return _hash(name, keys, str((pos, has_gauss, cached_gaussian)))
+
+
+class EvaluationCache:
+    '''
+    SQLite-backed evaluation cache, wraps Problem.evaluate calls requesting F when set as problem.eval_cache
+    - deterministic problems: each row and value is cached separately, only missing rows are evaluated
+    - noisy problems (problem.noisy): the whole batch is cached with the random state before evaluation,
+      the random state after evaluation is restored on a hit so that later evaluations are unaffected
+    '''
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    def _get_connection(self):
+        # NOTE: one connection per process, connections cannot be shared with forked or spawned processes
+        if self._conn is None or self._pid != os.getpid():
+            dirname = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(dirname, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS evals (key TEXT PRIMARY KEY, value BLOB)')
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def __getstate__(self):
+        return {'path': self.path, '_conn': None, '_pid': None}
+
+    def get(self, keys):
+        '''
+        Get cached values of keys, returns a dict of the found keys
+        '''
+        conn = self._get_connection()
+        found = {}
+        for i in range(0, len(keys), QUERY_CHUNK_SIZE):
+            chunk = keys[i:i + QUERY_CHUNK_SIZE]
+            query = f'SELECT key, value FROM evals WHERE key IN ({",".join("?" * len(chunk))})'
+            for key, value in conn.execute(query, chunk):
+                found[key] = pickle.loads(value)
+        return found
+
+    def put(self, items):
+        '''
+        Store a dict of key -> value
+        '''
+        conn = self._get_connection()
+        with conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO evals (key, value) VALUES (?, ?)',
+                [(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) for key, value in items.items()],
+            )
+
+    def evaluate(self, problem, X, *args, return_values_of='auto', return_as_dictionary=False, **kwargs):
+        '''
+        Same interface as Problem.evaluate, evaluations not in the cache are computed by problem._evaluate_uncached
+        '''
+        only_single_value = len(np.shape(X)) == 1
+        X = np.atleast_2d(X)
+
+        if type(return_values_of) == str and return_values_of == 'auto':
+            return_values_of = ['F']
+            if problem.n_constr > 0:
+                return_values_of.append('CV')
+        return_values_of = list(return_values_of)
+
+        signature = get_problem_signature(problem)
+        if len(args) > 0 or len(kwargs) > 0:
+            signature += get_arguments_signature(args, kwargs)
+        if problem.noisy:
+            out = self._evaluate_batch(problem, signature, X, return_values_of, *args, **kwargs)
+        else:
+            out = self._evaluate_rows(problem, signature, X, return_values_of, *args, **kwargs)
+
+        if only_single_value:
+            for key in out.keys():
+                if out[key] is not None:
+                    out[key] = out[key][0, :]
+
+        if return_as_dictionary:
+            return out
+        elif len(return_values_of) == 1:
+            return out[return_values_of[0]]
+        else:
+            return tuple([out[val] for val in return_values_of])
+
+    def _evaluate_batch(self, problem, signature, X, return_values_of, *args, **kwargs):
+        key = _hash(signature, str(return_values_of), X, get_rng_state_hash())
+        found = self.get([key])
+        if key in found:
+            out, rng_state = found[key]
+            np.random.set_state(rng_state)
+            return out
+        out = problem._evaluate_uncached(X, *args, return_values_of=return_values_of, return_as_dictionary=True, **kwargs)
+        self.put({key: (out, np.random.get_state())})
+        return out
+
+    def _evaluate_rows(self, problem, signature, X, return_values_of, *args, **kwargs):
+        keys = [[_hash(signature, val, x) for val in return_values_of] for x in X]
+        found = self.get([key for row_keys in keys for key in row_keys])
+
+        # evaluate rows with any requested value missing, all at once
+        missing = [i for i, row_keys in enumerate(keys) if not all(key in found for key in row_keys)]
+        if len(missing) > 0:
+            out_missing = problem._evaluate_uncached(
+                X[missing], *args, return_values_of=return_values_of, return_as_dictionary=True, **kwargs
+            )
+            items = {}
+            for j, i in enumerate(missing):
+                for val, key in zip(return_values_of, keys[i]):
+                    items[key] = None if out_missing[val] is None else out_missing[val][j]
+            self.put(items)
+            found.update(items)
+
+        out = {}
+        for k, val in enumerate(return_values_of):
+            rows = [found[row_keys[k]] for row_keys in keys]
+            out[val] = None if any(row is None for row in rows) else np.stack(rows)
+        return out
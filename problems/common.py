@@ -4,6 +4,8 @@ from problems import *
 from external import lhs
 from botorch.utils.sampling import draw_sobol_samples
 import torch
+from problems.cache import EvaluationCache
+from problems.artifacts import load_or_compute_pareto_front
 
 
 def get_problem_options():
@@ -88,7 +90,7 @@ def generate_initial_samples(problem, n_sample):
     return X, Y, rho
 
 
-def build_problem(name, n_var, n_obj, n_init_sample, n_process=1):
+def build_problem(name, n_var, n_obj, n_init_sample, n_process=1, eval_cache=None):
     '''
     Build optimization problem from name, get initial samples
     Input:
@@ -97,6 +99,7 @@ def build_problem(name, n_var, n_obj, n_init_sample, n_process=1):
         n_obj: number of objectives
         n_init_sample: number of initial samples
         n_process: number of parallel processes
+        eval_cache: path of the on-disk evaluation cache, None means no caching
     Output:
         problem: the optimization problem
         X_init, Y_init: initial samples
@@ -123,12 +126,19 @@ def build_problem(name, n_var, n_obj, n_init_sample, n_process=1):
             print(e)
             raise NotImplementedError('problem not supported yet or error!')
         try:
-            pareto_front = problem.pareto_front()
+            pareto_front = load_or_compute_pareto_front(problem)
         except Exception as e:
             print('no true pareto front defined for this problem!')
             print(e)
             pareto_front = None
 
+    if eval_cache is not None:
+        problem.eval_cache = EvaluationCache(eval_cache)
+
+    # evaluate expensive problems in a persistent process pool, reused by all later evaluations
+    if n_process > 1 and problem.expensive:
+        problem.set_process_pool(n_process)
+
     # get initial samples
     if 'exp' in name:
         X_init = problem.X[:n_init_sample]
@@ -6,18 +6,34 @@ from scipy.integrate import odeint
 
 class MixingProblem(Problem):
 
-    def __init__(self):
+    expensive = True
+
+    def __init__(self, batched=False, batch_chunk_size=32, max_ode_steps=50000):
+        '''
+        Input:
+            batched: simulate all rows of a batch at once (run_simulation_batched), otherwise row by row (run_simulation).
+                NOTE: faster, but Xs differs from the row-by-row simulation by up to a few percent (both are within the ODE tolerances),
+                so runs with batched=True do not reproduce runs made with the default
+            batch_chunk_size: maximum number of rows integrated as one stacked ODE system, since all rows share the step sizes
+            max_ode_steps: maximum number of internal steps of odeint for a stacked system
+        '''
         super().__init__(n_var=2, n_obj=2, n_constr=0, xl=[0.4,0.1], xu=[20,10])
         self.run_simulation_vectorized = np.vectorize(self.run_simulation)
+        self.batched = batched
+        self.batch_chunk_size = batch_chunk_size
+        self.max_ode_steps = max_ode_steps
     
     def _evaluate_F(self, x):
         Q_gas, Q_liquid = x[:, 0], x[:, 1]
+        if self.batched:
+            return np.column_stack(self.run_simulation_batched(Q_gas, Q_liquid))
         # Z = self.run_simulation_vectorized(Q_gas, Q_liquid)
         # return np.array(Z).transpose()
         # loop instead of vectorized
         Z = np.zeros((x.shape[0], 2))
         for i in range(x.shape[0]):
-            Z[i, :] = self.run_simulation(Q_gas[i], Q_liquid[i])
+            Xs, dP_t = self.run_simulation(Q_gas[i], Q_liquid[i])
+            Z[i, :] = Xs, np.squeeze(dP_t)
         return Z
     
     def _calc_pareto_front(self, n_pareto_points=100):
@@ -43,7 +59,7 @@ class MixingProblem(Problem):
         return Y_paretos
 
         
-    def run_simulation(self, Q_gas=0.5, Q_liquid=8, R=0.5e-3, L=0.05):
+    def run_simulation(self, Q_gas=0.5, Q_liquid=8, R=0.5e-3, L=0.05, rtol=1e-5, atol=1e-5):
         
         
         mixing, res, tr_i, dP_t = self.mixing_time(Q_gas, Q_liquid, R, L)
@@ -55,7 +71,7 @@ class MixingProblem(Problem):
         C_H2BO3_0 = C_H3BO3_0 / 2
         C_H_0 = 0.05625  # Initial concentration of H+ in stream 2 (M)
         
-        f_result, time_result, k2_result, Da2_result = self.solve_model(mixing.item(), C_H_0=C_H_0, C_I_0=C_I_0, C_IO3_0=C_IO3_0, C_H3BO3_0=C_H3BO3_0)
+        f_result, time_result, k2_result, Da2_result = self.solve_model(mixing.item(), C_H_0=C_H_0, C_I_0=C_I_0, C_IO3_0=C_IO3_0, C_H3BO3_0=C_H3BO3_0, rtol=rtol, atol=atol)
         
         I3_result = f_result[4][-1] * C_H_0
 
@@ -83,6 +99,38 @@ class MixingProblem(Problem):
 
         return Xs, dP_t
 
+    def run_simulation_batched(self, Q_gas, Q_liquid, R=0.5e-3, L=0.05, rtol=1e-5, atol=1e-5):
+        """
+        Batched version of run_simulation: film thicknesses of all rows are solved together by Newton iteration
+        and the kinetic ODEs of all rows are integrated as one stacked system.
+
+        Input: arrays of gas (L/min) and liquid (ml/min) flow rates
+        Output: arrays of segregation index Xs and pressure drop dP_t
+        """
+        mixing, res, tr_i, dP_t = self.mixing_time_batched(Q_gas, Q_liquid, R, L)
+
+        # Initial conditions, same as run_simulation
+        C_I_0 = 0.05
+        C_IO3_0 = 0.01
+        C_H3BO3_0 = 0.25
+        C_H2BO3_0 = C_H3BO3_0 / 2
+        C_H_0 = 0.05625
+
+        # NOTE: rows with similar mixing times have similar stiffness, so they are grouped into the same stacked system
+        f_end = np.zeros((len(mixing), 5))
+        order = np.argsort(mixing)
+        for start in range(0, len(order), self.batch_chunk_size):
+            idx = order[start:start + self.batch_chunk_size]
+            f_end[idx] = self.solve_model_batched(
+                mixing[idx], C_H_0=C_H_0, C_I_0=C_I_0, C_IO3_0=C_IO3_0, C_H3BO3_0=C_H3BO3_0, rtol=rtol, atol=atol
+            )
+
+        Y = 2 * 0.01 * f_end[:, 3] / (0.01 * C_H_0)
+        Yst = 6 * C_IO3_0 / C_H2BO3_0 / (6 * C_IO3_0 / C_H2BO3_0 + 1)
+        Xs = Y / Yst
+
+        return Xs, dP_t
+
     def mixing_time(self, Q_gas, Q_liquid, R=0.5e-3, L=0.05):
         """
         The function is used to solve the film thickness based on physical parameters.
@@ -151,65 +199,7 @@ class MixingProblem(Problem):
         )
 
         if exitflag == 1 or exitflag == 5 or True:
-            U_g = (m_g / rho_g) / (np.pi * (R - H) ** 2)  # gas film velocity (m/s)
-            U_l = (m_l / rho_l) / (
-                np.pi * (R**2 - (R - H) ** 2)
-            )  # liquid film velocity (m/s)
-
-            Re_g = rho_g * U_g * 2 * (R - H) / mu_g  # gas film Reynolds number
-            Re_l = rho_l * U_l * 2 * H / mu_l  # liquid film Reynolds number
-
-            # Friction factor calculation (unmodified)
-            f_g = np.where(Re_g < 2300, 16 / Re_g, 0.079 / (Re_g**0.25))
-            f_l = np.where(Re_l < 2300, 16 / Re_l, 0.079 / (Re_l**0.25))
-
-            # Shear calculation
-            t_i = 0.5 * f_g * rho_g * (U_g - U_l) ** 2  # interfacial shear stress (Pa)
-            tr_i = t_i / mu_l  # liquid shear rate (1/s)
-
-            t_w = 0.5 * f_l * rho_l * U_l**2  # wall shear stress (Pa)
-            tr_w = t_w / mu_l  # wall shear rate (1/s)
-
-            # Bulk residence time calculation
-            tres_l = L / U_l  # liquid phase residence time (s)
-            tres_g = L / U_g  # gas phase residence time (s)
-
-            # Pressure drop calculations
-            P_a = 101325  # atmospheric pressure (Pa)
-            x = m_g / (m_g + m_l)  # gas mass fraction
-            G = (m_g + m_l) / (np.pi * R**2)  # flow quality
-            dP_l = L / (2 * R) * (4 * f_l * G**2 * x**2) / (2 * rho_l)  # liquid phase
-            dP_g = (
-                np.sqrt(
-                    L / (2 * R) * (4 * f_g * G**2 * x**2) / (2 * rho_g) * 2 * P_a
-                    + P_a**2
-                )
-                - P_a
-            )  # gas phase
-            X = np.sqrt(dP_l / dP_g)
-
-            # Weir number calculations
-            C = np.where(
-                (Re_g < 2300) & (Re_l < 2300),
-                5,
-                np.where(
-                    (Re_g < 2300) & (Re_l >= 2300),
-                    10,
-                    np.where((Re_g >= 2300) & (Re_l < 2300), 12, 20),
-                ),
-            )
-
-            We_g = rho_g * U_g**2 * (R - H) * 2 / 0.072
-            We_l = rho_l * U_l**2 * (R * 2 - (R - H) * 2) / 0.072
-
-            psi_l = np.sqrt(1 + C / X + 1 / X**2)
-            dP_t = psi_l**2 * dP_l  # total pressure drop (Pa)
-            # minimize the pressure drop
-
-            U_gs = m_g / rho_g / (np.pi * R**2)
-            U_ls = m_l / rho_l / (np.pi * R**2)
-            e = dP_t / rho_l * U_l / L
-            um = 17.2 * np.sqrt(mu_l / rho_l / e)
+            um, tres_l, tr_i, dP_t = self.flow_properties(H, m_g, m_l, R, L)
 
         else:
             print(msg)
@@ -220,6 +210,145 @@ class MixingProblem(Problem):
 
         return um, tres_l, tr_i, dP_t
 
+    def mixing_time_batched(self, Q_gas, Q_liquid, R=0.5e-3, L=0.05, xtol=1e-8, maxiter=100):
+        """
+        Batched version of mixing_time, the film thickness equations of all rows are solved simultaneously
+        by a Newton iteration (finite difference derivative) with per-row convergence masking.
+        Rows that do not converge fall back to fsolve as in mixing_time.
+        """
+        rho_g, rho_l, mu_g, mu_l = 1.184, 998, 1.81e-5, 8.90e-4
+        Q_gas, Q_liquid = np.broadcast_arrays(np.asarray(Q_gas, dtype=float), np.asarray(Q_liquid, dtype=float))
+        m_g = Q_gas / 60 * 0.001 * rho_g
+        m_l = Q_liquid / 60 * 0.001 * 0.001 * rho_l
+
+        def annular_flow_eq(H, idx):
+            return self.film_thickness_vectorized(R, m_g[idx], m_l[idx], rho_g, rho_l, mu_g, mu_l, H) - H
+
+        H = np.full(Q_gas.shape, 1.6e-5)
+        active = np.ones(Q_gas.shape, dtype=bool)
+        for _ in range(maxiter):
+            idx = np.nonzero(active)[0]
+            if len(idx) == 0:
+                break
+            H_a = H[idx]
+            g = annular_flow_eq(H_a, idx)
+            dH = np.sqrt(np.finfo(float).eps) * np.maximum(np.abs(H_a), 1e-12)
+            dg = (annular_flow_eq(H_a + dH, idx) - g) / dH
+            with np.errstate(divide='ignore', invalid='ignore'):
+                step = np.where(dg != 0, g / dg, 0)
+            H_new = H_a - step
+            # damp steps leaving the physical domain (0, R)
+            H_new = np.where(H_new <= 0, H_a / 2, H_new)
+            H_new = np.where(H_new >= R, (H_a + R) / 2, H_new)
+            converged = np.abs(H_new - H_a) <= xtol * np.maximum(np.abs(H_new), 1e-12)
+            H[idx] = H_new
+            active[idx[converged | ~np.isfinite(H_new)]] = False
+
+        # NOTE: fall back to fsolve for rows not converged
+        failed = active | ~np.isfinite(H)
+        for i in np.nonzero(failed)[0]:
+            H[i] = fsolve(
+                lambda h: self.film_thickness(R, m_g[i], m_l[i], rho_g, rho_l, mu_g, mu_l, h) - h,
+                1.6e-5, xtol=1e-8, maxfev=int(1e4),
+            )[0]
+
+        return self.flow_properties(H, m_g, m_l, R, L)
+
+    def flow_properties(self, H, m_g, m_l, R=0.5e-3, L=0.05):
+        """
+        Flow quantities given the solved liquid film thickness H, elementwise for arrays.
+
+        Output: mixing time, liquid residence time, interfacial shear rate and pressure drop
+        """
+        rho_g = 1.184  # gas phase density (kg/m^3)
+        rho_l = 998  # liquid phase density (kg/m^3)
+        mu_g = 1.81e-5  # gas phase viscosity (Pa.s)
+        mu_l = 8.90e-4  # liquid phase viscosity (Pa.s)
+
+        U_g = (m_g / rho_g) / (np.pi * (R - H) ** 2)  # gas film velocity (m/s)
+        U_l = (m_l / rho_l) / (
+            np.pi * (R**2 - (R - H) ** 2)
+        )  # liquid film velocity (m/s)
+
+        Re_g = rho_g * U_g * 2 * (R - H) / mu_g  # gas film Reynolds number
+        Re_l = rho_l * U_l * 2 * H / mu_l  # liquid film Reynolds number
+
+        # Friction factor calculation (unmodified)
+        f_g = np.where(Re_g < 2300, 16 / Re_g, 0.079 / (Re_g**0.25))
+        f_l = np.where(Re_l < 2300, 16 / Re_l, 0.079 / (Re_l**0.25))
+
+        # Shear calculation
+        t_i = 0.5 * f_g * rho_g * (U_g - U_l) ** 2  # interfacial shear stress (Pa)
+        tr_i = t_i / mu_l  # liquid shear rate (1/s)
+
+        t_w = 0.5 * f_l * rho_l * U_l**2  # wall shear stress (Pa)
+        tr_w = t_w / mu_l  # wall shear rate (1/s)
+
+        # Bulk residence time calculation
+        tres_l = L / U_l  # liquid phase residence time (s)
+        tres_g = L / U_g  # gas phase residence time (s)
+
+        # Pressure drop calculations
+        P_a = 101325  # atmospheric pressure (Pa)
+        x = m_g / (m_g + m_l)  # gas mass fraction
+        G = (m_g + m_l) / (np.pi * R**2)  # flow quality
+        dP_l = L / (2 * R) * (4 * f_l * G**2 * x**2) / (2 * rho_l)  # liquid phase
+        dP_g = (
+            np.sqrt(
+                L / (2 * R) * (4 * f_g * G**2 * x**2) / (2 * rho_g) * 2 * P_a
+                + P_a**2
+            )
+            - P_a
+        )  # gas phase
+        X = np.sqrt(dP_l / dP_g)
+
+        # Weir number calculations
+        C = np.where(
+            (Re_g < 2300) & (Re_l < 2300),
+            5,
+            np.where(
+                (Re_g < 2300) & (Re_l >= 2300),
+                10,
+                np.where((Re_g >= 2300) & (Re_l < 2300), 12, 20),
+            ),
+        )
+
+        We_g = rho_g * U_g**2 * (R - H) * 2 / 0.072
+        We_l = rho_l * U_l**2 * (R * 2 - (R - H) * 2) / 0.072
+
+        psi_l = np.sqrt(1 + C / X + 1 / X**2)
+        dP_t = psi_l**2 * dP_l  # total pressure drop (Pa)
+        # minimize the pressure drop
+
+        U_gs = m_g / rho_g / (np.pi * R**2)
+        U_ls = m_l / rho_l / (np.pi * R**2)
+        e = dP_t / rho_l * U_l / L
+        um = 17.2 * np.sqrt(mu_l / rho_l / e)
+
+        return um, tres_l, tr_i, dP_t
+
+    def film_thickness_vectorized(self, R, m_g, m_l, rho_g, rho_l, mu_g, mu_l, H):
+        """
+        Vectorized film_thickness for arrays of flow rates and film thicknesses.
+        """
+        U_g = (m_g / rho_g) / (np.pi * (R - H) ** 2)
+        U_l = (m_l / rho_l) / (np.pi * (R**2 - (R - H) ** 2))
+        Re_g = rho_g * U_g * 2 * (R - H) / mu_g
+        Re_l = rho_l * U_l * 2 * H / mu_l
+        ratio = (rho_g * U_g**2) / (rho_l * U_l**2)
+
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            H_real = np.where(
+                Re_g < 2300,
+                np.where(
+                    m_g < 1.9733e-05,
+                    R * (1 - Re_l / Re_g * ratio),
+                    R * (1 - 0.288 * Re_l**1.39 / Re_g**0.69 * ratio),
+                ),
+                R * (1 - 0.0548 * Re_l**1.39 / Re_g**0.47 * ratio),
+            )
+        return H_real
+
     def film_thickness(self, R, m_g, m_l, rho_g, rho_l, mu_g, mu_l, H):
         # Calculate the flow characteristics of 2-phase annular flow
 
@@ -387,7 +516,34 @@ class MixingProblem(Problem):
         return dydtheta
 
 
-    def solve_model(self, tm, C_H_0=0.05625, C_I_0=0.05, C_IO3_0=0.01, C_H3BO3_0=0.25):
+    def solve_model_batched(self, tm, C_H_0=0.05625, C_I_0=0.05, C_IO3_0=0.01, C_H3BO3_0=0.25, rtol=1e-5, atol=1e-5):
+        """
+        Batched version of solve_model for an array of mixing times.
+        The ODE systems of all rows are stacked into one system (5 states per row, contiguous),
+        whose Jacobian is block diagonal and hence passed to odeint as banded.
+        NOTE: all rows share the step sizes, so results differ from solve_model within the integration tolerances
+
+        It returns the dimensionless concentrations of each row at the last time step with positive acid concentration,
+        i.e. f_cleaned[:, -1] of solve_model, with shape (n, 5)
+        """
+        tm = np.atleast_1d(np.asarray(tm, dtype=float))
+        n = tm.shape[0]
+        C = [C_I_0, C_IO3_0, C_H3BO3_0, C_H_0]
+
+        time = np.linspace(0, 0.4, num=100)
+
+        def odefun(y, theta):
+            dydtheta = self.VD_model(y.reshape(n, 5).T, theta, tm, C)
+            return np.stack(dydtheta, axis=1).ravel()
+
+        y0 = np.tile([1, 0, 0, 0, 0], n).astype(float)
+        f_values = odeint(odefun, y0, time, rtol=rtol, atol=atol, ml=4, mu=4, mxstep=self.max_ode_steps).reshape(len(time), n, 5)
+
+        # same cleaning as solve_model: keep as many time steps as there are positive acid concentrations
+        count = np.count_nonzero(f_values[:, :, 0] > 0, axis=0)
+        return f_values[count - 1, np.arange(n)]
+
+    def solve_model(self, tm, C_H_0=0.05625, C_I_0=0.05, C_IO3_0=0.01, C_H3BO3_0=0.25, rtol=1e-5, atol=1e-5):
         """
         Main function to solve the ODEs for given initial conditions.
         Function accepts mixing time (tm) since it changes with reaction conditions
@@ -406,7 +562,7 @@ class MixingProblem(Problem):
         odefun = lambda t, y: self.VD_model(
             t, y, tm, [C_I_0, C_IO3_0, C_H3BO3_0, C_H_0]
         )  # Evaluate the function with system parameters
-        f_values = odeint(odefun, [1, 0, 0, 0, 0], time, rtol=1e-5, atol=1e-5).T
+        f_values = odeint(odefun, [1, 0, 0, 0, 0], time, rtol=rtol, atol=atol).T
 
         # Remove the negative concentration values since we do not know when the reaction ends
         boolArr = f_values[0] > 0
@@ -444,8 +600,29 @@ class MixingProblem(Problem):
         )
 
 
-#test pareto front calculation
+#check agreement and speed of batched simulation against run_simulation
 if __name__ == "__main__":
-    prob = MixingProblem()
-    true_front = prob.pareto_front()
-    print(true_front)
\ No newline at end of file
+    from time import time
+
+    prob = MixingProblem(batched=True)
+    rng = np.random.default_rng(0)
+    x = prob.xl + rng.random((100, prob.n_var)) * (prob.xu - prob.xl)
+
+    t = time()
+    Z_batched = prob._evaluate_F(x)
+    t_batched = time() - t
+
+    t = time()
+    Z_loop = np.array([[np.squeeze(v) for v in prob.run_simulation(*row)] for row in x])
+    t_loop = time() - t
+
+    # NOTE: with the default tolerances (1e-5) the kinetics are only accurate to a few percent, compare both to a converged solution
+    Z_ref = np.array([[np.squeeze(v) for v in prob.run_simulation(*row, rtol=1e-7, atol=1e-8)] for row in x])
+    err_batched = np.abs(Z_batched - Z_ref) / np.abs(Z_ref)
+    err_loop = np.abs(Z_loop - Z_ref) / np.abs(Z_ref)
+
+    print(f"loop: {t_loop:.3f}s, batched: {t_batched:.3f}s")
+    print(f"max relative error of Xs to converged solution: loop {err_loop[:, 0].max():.2e}, batched {err_batched[:, 0].max():.2e}")
+    print(f"max relative error of dP_t: {np.max(np.abs(Z_batched[:, 1] - Z_loop[:, 1]) / Z_loop[:, 1]):.2e}")
+    assert np.allclose(Z_batched[:, 1], Z_loop[:, 1], rtol=1e-8)
+    assert err_batched[:, 0].max() <= max(err_loop[:, 0].max(), 0.02)
@@ -1,7 +1,7 @@
 import numpy as np
 import autograd
 from autograd.numpy import row_stack
-from multiprocessing import cpu_count
+from multiprocessing import cpu_count, Pool
 from multiprocessing.pool import ThreadPool
 from pymoo.model.problem import Problem as PymooProblem
 from pymoo.model.problem import at_least2d, evaluate_in_parallel
@@ -11,9 +11,53 @@ Problem definition built upon Pymoo's Problem class, added some custom features
 """
 
 
+def _evaluate_chunk(problem, X, elementwise, seed, args, kwargs):
+    """
+    Evaluate a chunk of rows in a worker process of the process pool.
+    The seed is drawn by the parent process, so that noisy problems get different and reproducible noise per chunk.
+    """
+    if seed is not None:
+        np.random.seed(seed)
+    if elementwise:
+        ret = []
+        for x in X:
+            _out = {}
+            problem._evaluate(x, _out, *args, **kwargs)
+            ret.append(_out)
+        return {key: row_stack([_out[key] for _out in ret]) for key in ret[0].keys()}
+    out = {}
+    problem._evaluate(X, out, *args, **kwargs)
+    at_least2d(out)
+    return out
+
+
 class Problem(PymooProblem):
+    # whether the evaluation is expensive enough to be worth a process pool (see set_process_pool)
+    expensive = False
+    # whether the evaluation depends on the global random state (see problems/cache.py)
+    noisy = False
+    # on-disk evaluation cache (problems.cache.EvaluationCache), None means no caching
+    eval_cache = None
+
     def evaluate(
         self, X, *args, return_values_of="auto", return_as_dictionary=False, **kwargs
+    ):
+        """
+        Evaluate the given problem, served from the evaluation cache if set (see _evaluate_uncached).
+        """
+        # NOTE: only evaluations of objectives are cached, constraint-only queries (e.g. feasibility of every candidate
+        # evaluated by surrogate problems) are cheap and would only fill the cache
+        requested = ["F"] if type(return_values_of) == str and return_values_of == "auto" else return_values_of
+        if self.eval_cache is not None and "F" in requested:
+            return self.eval_cache.evaluate(
+                self, X, *args, return_values_of=return_values_of, return_as_dictionary=return_as_dictionary, **kwargs
+            )
+        return self._evaluate_uncached(
+            X, *args, return_values_of=return_values_of, return_as_dictionary=return_as_dictionary, **kwargs
+        )
+
+    def _evaluate_uncached(
+        self, X, *args, return_values_of="auto", return_as_dictionary=False, **kwargs
     ):
         """
         Evaluate the given problem.
@@ -174,10 +218,73 @@ class Problem(PymooProblem):
 
     def _evaluate_batch(self, X, calc_gradient, out, *args, **kwargs):
         # NOTE: to use self-calculated dF (gradient) rather than autograd.numpy, which is not supported by Pymoo
+        # NOTE: only objective evaluations are distributed, constraint queries (e.g. of surrogate problems) are cheap and frequent
+        if self._get_parallelization()[0] == "processes" and len(X) > 1 and "F" in kwargs.get("return_values_of", []):
+            return self._evaluate_processes(X, False, calc_gradient, out, *args, **kwargs)
         self._evaluate(X, out, *args, calc_gradient=calc_gradient, **kwargs)
         at_least2d(out)
         return out
 
+    def _get_parallelization(self):
+        parallelization = getattr(self, "parallelization", None)
+        if not isinstance(parallelization, (list, tuple)):
+            parallelization = [parallelization]
+        return parallelization
+
+    def set_process_pool(self, n_process, chunk_size=None):
+        """
+        Evaluate with a persistent pool of n_process worker processes, X is split into chunks of at most chunk_size rows
+        (default: evenly into n_process chunks). The pool is created at the first evaluation and reused afterwards.
+        """
+        self.close_process_pool()
+        self.parallelization = ("processes", n_process, chunk_size)
+
+    def close_process_pool(self):
+        pool = getattr(self, "_process_pool", None)
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        self._process_pool = None
+
+    def _get_process_pool(self, n_process):
+        if getattr(self, "_process_pool", None) is None:
+            self._process_pool = Pool(n_process)
+        return self._process_pool
+
+    def _evaluate_processes(self, X, elementwise, calc_gradient, out, *args, **kwargs):
+        _params = self._get_parallelization()[1:]
+        n_process = _params[0] if len(_params) > 0 and _params[0] is not None else cpu_count()
+        chunk_size = _params[1] if len(_params) > 1 else None
+        if chunk_size is None:
+            n_chunk = min(n_process, len(X))
+        else:
+            n_chunk = int(np.ceil(len(X) / chunk_size))
+        chunks = np.array_split(X, n_chunk)
+
+        # NOTE: seeds of noisy problems are drawn from the global random state of the parent, workers would otherwise share a frozen state,
+        # deterministic problems leave the global random state as serial evaluation does
+        seeds = np.random.randint(np.iinfo(np.int32).max, size=n_chunk) if self.noisy else [None] * n_chunk
+        kwargs = dict(kwargs, calc_gradient=calc_gradient)
+        pool = self._get_process_pool(n_process)
+        ret = pool.starmap(
+            _evaluate_chunk,
+            [(self, chunk, elementwise, seed, args, kwargs) for chunk, seed in zip(chunks, seeds)],
+        )
+
+        # stack all the chunk outputs together
+        for key in ret[0].keys():
+            if ret[0][key] is None:
+                out[key] = None
+            else:
+                out[key] = row_stack([ret[i][key] for i in range(len(ret))])
+        return out
+
+    def __getstate__(self):
+        # NOTE: the process pool cannot be pickled, e.g. when the problem is sent to worker processes or deep copied
+        state = self.__dict__.copy()
+        state["_process_pool"] = None
+        return state
+
     def _evaluate_elementwise(self, X, calc_gradient, out, *args, **kwargs):
         # NOTE: to use self-calculated dF (gradient) rather than autograd.numpy, which is not supported by Pymoo
         ret = []
@@ -206,6 +313,8 @@ class Problem(PymooProblem):
                 for k in range(len(X)):
                     params.append([X[k], calc_gradient, self._evaluate, args, kwargs])
                 ret = np.array(pool.starmap(evaluate_in_parallel, params))
+        elif _type == "processes":
+            return self._evaluate_processes(X, True, calc_gradient, out, *args, **kwargs)
         elif _type == "dask":
             if len(_params) != 2:
                 raise Exception(
@@ -220,7 +329,7 @@ class Problem(PymooProblem):
             ret = [job.result() for job in jobs]
         else:
             raise Exception(
-                "Unknown parallelization method: %s (None, threads, dask)"
+                "Unknown parallelization method: %s (None, threads, processes, dask)"
                 % self.parallelization
             )
         # stack all the single outputs together
@@ -233,6 +342,8 @@ class Problem(PymooProblem):
 
 
 class RiskyProblem(Problem):
+
+    noisy = True
     
     def _evaluate_F(self, x):
         train_obj = self.evaluate_repeat(x)
@@ -4,6 +4,7 @@ sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 import numpy as np
 from argparse import ArgumentParser
 from problems.common import build_problem
+from problems.artifacts import load_or_compute_ref_point
 
 
 import torch
@@ -14,15 +15,20 @@ class RefPoint:
     ref_point_botroch = None
     ref_point_pymoo = None
     
-    def __init__(self, problem, n_var=6, n_obj=2, n_init_sample=100, seed=0, is_botorch=False):
-        
-        np.random.seed(seed)
-        _, _, _, Y_init, rho_init = build_problem(problem, n_var, n_obj, n_init_sample)
-    
-        self.ref_point_botroch = infer_reference_point(torch.tensor(-Y_init)).numpy().tolist()
-        # self.ref_point_botroch = np.max(-Y_init, axis=0).tolist()
-        # self.ref_point_pymoo= np.max(Y_init, axis=0).tolist()
-        self.ref_point_pymoo = (-infer_reference_point(torch.tensor(-Y_init)).numpy()).tolist()
+    def __init__(self, problem, n_var=6, n_obj=2, n_init_sample=100, seed=0, is_botorch=False, eval_cache=None):
+
+        def compute_ref_point():
+            _, _, _, Y_init, rho_init = build_problem(problem, n_var, n_obj, n_init_sample, eval_cache=eval_cache)
+            ref_point_botroch = infer_reference_point(torch.tensor(-Y_init)).numpy().tolist()
+            # ref_point_botroch = np.max(-Y_init, axis=0).tolist()
+            # ref_point_pymoo= np.max(Y_init, axis=0).tolist()
+            ref_point_pymoo = (-infer_reference_point(torch.tensor(-Y_init)).numpy()).tolist()
+            return ref_point_pymoo, ref_point_botroch
+
+        # NOTE: stored per configuration, computed with a random state isolated from the caller
+        self.ref_point_pymoo, self.ref_point_botroch = load_or_compute_ref_point(
+            problem, n_var, n_obj, n_init_sample, seed, compute_ref_point
+        )
         print(self)
 
     def get_ref_point(self, is_botorch=False):
@@ -46,8 +52,9 @@ if __name__ == '__main__':
     parser.add_argument('--n-var', type=int, default=2)
     parser.add_argument('--n-obj', type=int, default=2)
     parser.add_argument('--n-init-sample', type=int, default=500)
+    parser.add_argument('--eval-cache', type=str, default=None)
     args = parser.parse_args()
 
-    ref_point_handler = RefPoint(args.problem, args.n_var, args.n_obj, args.n_init_sample)
+    ref_point_handler = RefPoint(args.problem, args.n_var, args.n_obj, args.n_init_sample, eval_cache=args.eval_cache)
 
     print(ref_point_handler)
\ No newline at end of file
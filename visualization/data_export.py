@@ -202,7 +202,8 @@ class DataExport:
 
             d3["ParetoFamily"] = family_lbls
 
-        else:
+        # NOTE: solvers recomputing the approximate front only every k iterations (e.g. BoTorchSolver) are exported only when it is new
+        elif getattr(self.optimizer.solver, "approx_front_due", True):
             approx_pset = self.optimizer.solver.solution["x"]
             val = self.optimizer.surrogate_model.evaluate(approx_pset)
             approx_pfront = val["F"]
@@ -224,6 +225,10 @@ class DataExport:
 
             d3["ParetoFamily"] = np.zeros(approx_front_samples)
 
+        else:
+            d3 = {}
+
+        if not self.has_family:
             # create dataframe from val dict. If field in val is 2d array, then create columns for each element in array
             d4 = {}
             n_grid = 25